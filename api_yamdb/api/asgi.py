@@ -0,0 +1,189 @@
+"""
+ASGI-режим для Django 2.2 с асинхронной обработкой горячих путей чтения.
+
+В Django 2.2 нет асинхронных вьюх, поэтому горячие GET-маршруты
+(список и карточка произведения, список отзывов) обслуживаются
+асинхронным обработчиком: сам обработчик Django с ORM выполняется
+в ограниченном пуле потоков, а части ответа передаются клиенту по мере
+готовности, поэтому потоковые страницы и их сжатие не буферизуются.
+Слот освобождается, когда обработчик закончил; медленный клиент
+задерживает его, только если не успевает забрать STREAM_QUEUE_SIZE
+частей. Ожидание БД не занимает процесс целиком, а число одновременно
+обрабатываемых и ожидающих запросов на воркер ограничено
+(ASGI_MAX_CONCURRENCY, ASGI_MAX_QUEUE).
+Остальные маршруты проходят через asgiref.wsgi.WsgiToAsgi с тем же
+ограничением.
+"""
+
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.conf import settings
+
+READ_PATHS = (
+    re.compile(r'^/api/v1/titles/$'),
+    re.compile(r'^/api/v1/titles/\d+/$'),
+    re.compile(r'^/api/v1/titles/\d+/reviews/$'),
+)
+OVERLOADED = json.dumps({'detail': 'Сервер перегружен.'}).encode()
+# Сколько частей ответа обработчик может подготовить впрок.
+STREAM_QUEUE_SIZE = 16
+
+
+def is_read_path(scope):
+    return (scope['method'] == 'GET'
+            and any(path.match(scope['path']) for path in READ_PATHS))
+
+
+async def read_body(receive):
+    """Прочитать тело запроса во временный файл."""
+    body = SpooledTemporaryFile(max_size=65536)
+    while True:
+        message = await receive()
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+class AsyncReadApplication:
+    """ASGI-приложение поверх WSGI-обработчика Django."""
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+        self.fallback = WsgiToAsgi(wsgi_application)
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi-orm',
+        )
+        self.semaphore = None
+        self.waiting = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if self.semaphore is None:
+            # Семафор привязан к циклу событий воркера.
+            self.semaphore = asyncio.Semaphore(
+                settings.ASGI_MAX_CONCURRENCY
+            )
+        if self.semaphore.locked() and (
+            self.waiting >= settings.ASGI_MAX_QUEUE
+        ):
+            await self.send_response(
+                send, 503, [(b'content-type', b'application/json')],
+                OVERLOADED,
+            )
+            return
+        if is_read_path(scope):
+            await self.read_view(scope, receive, send)
+            return
+        await self.acquire()
+        try:
+            await self.fallback(scope, receive, send)
+        finally:
+            self.semaphore.release()
+
+    async def acquire(self):
+        """Дождаться слота обработки, учитывая длину очереди."""
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    async def read_view(self, scope, receive, send):
+        """Асинхронная обработка GET: ORM в пуле, части ответа —
+        клиенту по мере готовности."""
+        body = await read_body(receive)
+        loop = asyncio.get_event_loop()
+        messages = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stopped = threading.Event()
+        await self.acquire()
+        producer = loop.run_in_executor(
+            self.executor, self.run_wsgi, scope, body, messages, stopped, loop
+        )
+        producer.add_done_callback(lambda _: self.semaphore.release())
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    break
+                await send(message)
+        finally:
+            # Клиент отключился: обработчик перестаёт готовить части,
+            # а уже подготовленные отбрасываются.
+            stopped.set()
+            while not messages.empty():
+                messages.get_nowait()
+            await producer
+            body.close()
+
+    def run_wsgi(self, scope, body, messages, stopped, loop):
+        """Выполнить обработчик Django в потоке пула.
+
+        Сообщения ASGI передаются в messages по мере готовности частей
+        ответа, в конце — None. Весь ответ, включая потоковый, строится
+        в одном потоке: соединения с БД привязаны к потоку.
+        """
+        def put(message):
+            if not stopped.is_set():
+                asyncio.run_coroutine_threadsafe(
+                    messages.put(message), loop
+                ).result()
+
+        instance = WsgiToAsgiInstance(self.wsgi_application)
+        instance.scope = scope
+        environ = instance.build_environ(scope, body)
+
+        def start_response(status, response_headers, exc_info=None):
+            put({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in response_headers
+                ],
+            })
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                for chunk in result:
+                    if stopped.is_set():
+                        break
+                    if chunk:
+                        put({'type': 'http.response.body', 'body': chunk,
+                             'more_body': True})
+                put({'type': 'http.response.body', 'body': b''})
+            finally:
+                # Сигнал request_finished: закрытие соединений с БД.
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            put(None)
+
+    async def send_response(self, send, status, headers, content):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
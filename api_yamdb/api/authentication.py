@@ -0,0 +1,104 @@
+"""
+Аутентификация для приложения api.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class LocalUserCache:
+    """Потокобезопасный LRU-кеш пользователей процесса с TTL."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_user_cache = LocalUserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_LOCAL_TTL,
+)
+
+
+def shared_user_cache():
+    """Общий кеш пользователей или None, если он не настроен."""
+    if settings.USER_CACHE_ALIAS is None:
+        return None
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Удалить пользователя из локального и общего кеша."""
+    key = user_cache_key(user_id)
+    local_user_cache.delete(key)
+    shared = shared_user_cache()
+    if shared is not None:
+        shared.delete(key)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация, которая берёт пользователя из кеша.
+
+    Сначала проверяется LRU-кеш процесса с коротким TTL, затем общий
+    кеш (если задан USER_CACHE_ALIAS), и только потом БД. Изменение
+    пользователя сбрасывает оба уровня (см. api.signals); TTL локального
+    уровня ограничивает устаревание в остальных процессах.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        key = user_cache_key(user_id)
+        user = local_user_cache.get(key)
+        if user is None:
+            shared = shared_user_cache()
+            if shared is not None:
+                user = shared.get(key)
+            if user is None:
+                user = super().get_user(validated_token)
+                if shared is not None:
+                    shared.set(key, user, settings.USER_CACHE_SHARED_TTL)
+            local_user_cache.set(key, user)
+        # Копия, чтобы изменения в запросе не попадали в общий объект.
+        return copy.copy(user)
@@ -0,0 +1,126 @@
+"""
+Кеш ответов для эндпоинтов каталога (произведения, категории, жанры).
+
+Ключ кеша строится из полного URL запроса и номера версии каталога.
+Любое изменение Title, Genre, Category, GenreTitle или Review увеличивает
+версию, и старые записи больше не читаются, а вытесняются по TTL/LRU
+самим бэкендом кеша.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from .pagination import estimate_count
+from .renderers import StreamingJSONResponse
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_catalog_version():
+    """Вернуть текущую версию каталога."""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is not None:
+        return version
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def bump_catalog_version():
+    """Инвалидировать кеш каталога."""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+def make_key(request):
+    url = request.build_absolute_uri().encode()
+    return (f'catalog:{get_catalog_version()}:'
+            f'{hashlib.md5(url).hexdigest()}')
+
+
+def get_leaderboard(name, request, build, timeout):
+    """Вернуть рейтинг из кеша или построить его через build().
+
+    Ключ не зависит от версии каталога: рейтинг обновляется не чаще
+    раза в timeout секунд, это и есть граница его устаревания.
+    """
+    cache = get_cache()
+    url = request.build_absolute_uri().encode()
+    key = f'leaderboard:{name}:{hashlib.md5(url).hexdigest()}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout)
+    return data
+
+
+def get_catalog_count(queryset):
+    """Количество объектов таблицы каталога и точное ли оно.
+
+    Для таблиц от COUNT_ESTIMATE_MIN_ROWS строк берётся оценка
+    PostgreSQL, иначе COUNT(*). Результат кешируется до смены версии
+    каталога.
+    """
+    cache = get_cache()
+    key = (f'catalog:{get_catalog_version()}:count:'
+           f'{queryset.model._meta.db_table}')
+    known = cache.get(key)
+    if known is None:
+        estimate = estimate_count(queryset)
+        if (estimate is not None
+                and estimate >= settings.COUNT_ESTIMATE_MIN_ROWS):
+            known = (estimate, False)
+        else:
+            known = (queryset.count(), True)
+        cache.set(key, known, settings.CATALOG_CACHE_TIMEOUT)
+    return known
+
+
+class CatalogCacheMixin:
+    """Миксин вьюсета: кеширует данные ответов list.
+
+    Количество объектов для пагинации списка без фильтров берётся
+    из get_catalog_count.
+    """
+
+    def get_pagination_count(self, queryset):
+        query = queryset.query
+        if query.has_filters() or query.distinct:
+            return None
+        return get_catalog_count(queryset)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = make_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        # Потоковые ответы не кешируются: данные — генератор.
+        if (response.status_code == status.HTTP_200_OK
+                and not isinstance(response, StreamingJSONResponse)):
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CatalogDetailCacheMixin(CatalogCacheMixin):
+    """Миксин вьюсета с retrieve: кеширует и ответы retrieve."""
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,82 @@
+"""
+Маршрутизация чтения на реплики БД.
+
+Реплику на время запроса выбирает ReplicaRoutingMiddleware: только для
+безопасных методов и только если клиент недавно ничего не записывал
+(read-your-writes). Запись, миграции и всё вне запросов api (команды,
+фоновые задачи) идут в default.
+"""
+
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+state = threading.local()
+
+# Момент (time.monotonic), до которого реплика считается недоступной.
+unavailable_until = {}
+
+
+def current_replica():
+    return getattr(state, 'replica', None)
+
+
+def set_replica(alias):
+    state.replica = alias
+
+
+def close_if_unusable(alias):
+    """Закрыть разорванное постоянное соединение (CONN_MAX_AGE > 0).
+
+    При DB_CONN_HEALTH_CHECKS открытое соединение проверяется перед
+    повторным использованием, и следующий запрос откроет новое.
+    """
+    connection = connections[alias]
+    if (settings.DB_CONN_HEALTH_CHECKS
+            and connection.connection is not None
+            and not connection.is_usable()):
+        connection.close()
+
+
+def check_connection(alias):
+    """Проверить соединение; False, если соединиться не удалось."""
+    connection = connections[alias]
+    try:
+        close_if_unusable(alias)
+        connection.ensure_connection()
+    except DatabaseError:
+        connection.close()
+        return False
+    return True
+
+
+def choose_replica():
+    """Случайная доступная реплика или None (читать из default)."""
+    now = time.monotonic()
+    replicas = [alias for alias in settings.DATABASE_REPLICAS
+                if unavailable_until.get(alias, 0) <= now]
+    random.shuffle(replicas)
+    for alias in replicas:
+        if check_connection(alias):
+            return alias
+        unavailable_until[alias] = now + settings.REPLICA_RETRY_SECONDS
+    return None
+
+
+class ReplicaRouter:
+    """Роутер БД: чтение из выбранной для запроса реплики."""
+
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
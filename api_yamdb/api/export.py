@@ -0,0 +1,148 @@
+"""
+Потоковая выгрузка каталога произведений в NDJSON и CSV.
+
+Произведения читаются пачками по id (keyset), жанры и отзывы
+подгружаются отдельным запросом на пачку, отзывы выводятся по мере
+чтения курсором. Поэтому потребление памяти не зависит от размера
+таблиц и числа отзывов произведения, а транзакция на время выгрузки
+не держится.
+"""
+
+import csv
+import json
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from rest_framework import serializers
+from reviews.models import Review
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+TITLE_COLUMNS = ('id', 'name', 'year', 'rating', 'description', 'genre',
+                 'category')
+REVIEW_COLUMNS = ('review_id', 'review_text', 'review_author',
+                  'review_score', 'review_pub_date')
+
+pub_date_field = serializers.DateTimeField()
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer, возвращающий строку."""
+
+    def write(self, value):
+        return value
+
+
+def title_chunks(queryset, with_reviews=False):
+    """Пачки произведений по возрастанию id с жанрами и отзывами.
+
+    Отзывы пачки читаются одним запросом через iterator() и отдаются
+    итератором по каждому произведению: его нужно дочитать до перехода
+    к следующему произведению.
+    """
+    queryset = queryset.prefetch_related(None).order_by('id')
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.filter(id__gt=last_id)[:settings.EXPORT_CHUNK_SIZE]
+        )
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, 'genre')
+        if with_reviews:
+            yield from chunk_reviews(chunk)
+        else:
+            for title in chunk:
+                yield title, iter(())
+        last_id = chunk[-1].id
+
+
+def chunk_reviews(chunk):
+    """Пары (произведение, итератор его отзывов) для пачки."""
+    rows = (
+        Review.objects.filter(title_id__in=[title.id for title in chunk])
+        .select_related('author').order_by('title_id', 'id').iterator()
+    )
+    groups = groupby(rows, key=lambda review: review.title_id)
+    group = next(groups, None)
+    for title in chunk:
+        if group is not None and group[0] == title.id:
+            yield title, group[1]
+            group = next(groups, None)
+        else:
+            yield title, iter(())
+
+
+def title_data(title):
+    return {
+        'id': title.id,
+        'name': title.name,
+        'year': title.year,
+        'rating': title.rating,
+        'description': title.description,
+        'genre': [{'name': genre.name, 'slug': genre.slug}
+                  for genre in title.genre.all()],
+        'category': ({'name': title.category.name,
+                      'slug': title.category.slug}
+                     if title.category else None),
+    }
+
+
+def review_data(review):
+    return {
+        'id': review.id,
+        'text': review.text,
+        'author': review.author.username,
+        'score': review.score,
+        'pub_date': pub_date_field.to_representation(review.pub_date),
+    }
+
+
+def ndjson_lines(queryset, with_reviews):
+    """Строки NDJSON: одно произведение (и его отзывы) на строку."""
+    for title, reviews in title_chunks(queryset, with_reviews):
+        line = json.dumps(title_data(title), ensure_ascii=False)
+        if not with_reviews:
+            yield line + '\n'
+            continue
+        # Отзывы пишутся по одному, строка целиком в памяти не собирается.
+        yield line[:-1] + ', "reviews": ['
+        for number, review in enumerate(reviews):
+            yield (', ' if number else '') + json.dumps(
+                review_data(review), ensure_ascii=False
+            )
+        yield ']}\n'
+
+
+def csv_lines(queryset, with_reviews):
+    """Строки CSV: произведение, либо по строке на каждый его отзыв."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        TITLE_COLUMNS + (REVIEW_COLUMNS if with_reviews else ())
+    )
+    for title, reviews in title_chunks(queryset, with_reviews):
+        row = (
+            title.id, title.name, title.year, title.rating,
+            title.description,
+            ';'.join(genre.slug for genre in title.genre.all()),
+            title.category.slug if title.category else '',
+        )
+        if not with_reviews:
+            yield writer.writerow(row)
+            continue
+        empty = True
+        for review in reviews:
+            empty = False
+            data = review_data(review)
+            yield writer.writerow(row + (
+                data['id'], data['text'], data['author'], data['score'],
+                data['pub_date'],
+            ))
+        if empty:
+            yield writer.writerow(row + ('',) * len(REVIEW_COLUMNS))
+
+
+EXPORTERS = {'ndjson': ndjson_lines, 'csv': csv_lines}
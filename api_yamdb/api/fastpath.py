@@ -0,0 +1,204 @@
+"""
+Быстрый путь списков: словари из values() по заранее собранному плану.
+
+План собирается по сериализатору (уже урезанному ?fields=): для
+каждого поля — колонка values() и преобразование, которое сериализатор
+выполнил бы над атрибутом модели, поэтому ответ совпадает с обычным.
+Вложенные сериализаторы по ForeignKey читаются тем же запросом,
+по ManyToMany — одним запросом на страницу, как prefetch_related.
+Если поле плану не по силам (методы, source='*', обратные связи),
+список строится сериализатором.
+"""
+
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.response import Response
+
+from .middleware import timing_phase
+from .renderers import StreamingJSONResponse
+
+# Значения этих полей из values() уже в нужном виде.
+IDENTITY_FIELDS = (
+    (serializers.CharField, (models.CharField, models.TextField)),
+    (serializers.IntegerField, (models.IntegerField, models.AutoField)),
+)
+
+
+class UnsupportedFieldError(Exception):
+    """Поле сериализатора нельзя построить из values()."""
+
+
+def nullable(column, convert):
+    def getter(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return getter
+
+
+def model_field_for(field, opts):
+    if field.source == '*' or '.' in field.source:
+        raise UnsupportedFieldError(field.field_name)
+    try:
+        return opts.get_field(field.source)
+    except FieldDoesNotExist:
+        raise UnsupportedFieldError(field.field_name)
+
+
+class FieldPlan:
+    """Колонки values() и функции построения полей ответа."""
+
+    def __init__(self, serializer, model, prefix=''):
+        if (type(serializer).to_representation
+                is not serializers.Serializer.to_representation):
+            raise UnsupportedFieldError(serializer)
+        opts = model._meta
+        self.pk = prefix + opts.pk.attname
+        self.columns = [self.pk]
+        self.getters = []
+        self.many = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            model_field = model_field_for(field, opts)
+            column = prefix + field.source
+            if isinstance(field, serializers.ListSerializer):
+                self.add_many(name, field.child, model_field, prefix)
+            elif isinstance(field, serializers.BaseSerializer):
+                self.add_nested(name, field, model_field, column)
+            elif type(field) is serializers.SlugRelatedField:
+                self.add_slug(name, field, model_field, column)
+            else:
+                self.add_value(name, field, model_field, column)
+
+    def add_value(self, name, field, model_field, column):
+        """Поле модели: колонка и to_representation поля."""
+        if (isinstance(field, (serializers.RelatedField,
+                               serializers.ManyRelatedField))
+                or type(field).get_attribute is not Field.get_attribute
+                or model_field.is_relation
+                or not model_field.concrete):
+            raise UnsupportedFieldError(name)
+        self.columns.append(column)
+        if any(type(field) is field_class
+               and isinstance(model_field, model_classes)
+               for field_class, model_classes in IDENTITY_FIELDS):
+            self.getters.append((name, itemgetter(column)))
+        else:
+            self.getters.append(
+                (name, nullable(column, field.to_representation))
+            )
+
+    def add_slug(self, name, field, model_field, column):
+        """SlugRelatedField по ForeignKey: колонка через JOIN."""
+        if not model_field.many_to_one:
+            raise UnsupportedFieldError(name)
+        column = f'{column}__{field.slug_field}'
+        self.columns.append(column)
+        self.getters.append((name, itemgetter(column)))
+
+    def add_nested(self, name, serializer, model_field, column):
+        """Вложенный сериализатор по ForeignKey: колонки через JOIN."""
+        if not model_field.many_to_one:
+            raise UnsupportedFieldError(name)
+        plan = FieldPlan(serializer, model_field.related_model,
+                         prefix=f'{column}__')
+        if plan.many:
+            raise UnsupportedFieldError(name)
+        self.columns.append(column)
+        self.columns.extend(plan.columns)
+
+        def getter(row):
+            return None if row[column] is None else plan.build(row)
+
+        self.getters.append((name, getter))
+
+    def add_many(self, name, serializer, model_field, prefix):
+        """Вложенный список по ManyToMany: запрос на страницу."""
+        if prefix or not model_field.many_to_many:
+            raise UnsupportedFieldError(name)
+        plan = FieldPlan(serializer, model_field.related_model)
+        if plan.many:
+            raise UnsupportedFieldError(name)
+        query_name = model_field.related_query_name()
+        manager = model_field.related_model._default_manager
+
+        def fetch(ids):
+            # Тот же запрос, что и у prefetch_related, но без моделей.
+            rows = manager.filter(**{f'{query_name}__in': ids}).values(
+                query_name, *plan.columns
+            )
+            related = {}
+            for row in rows:
+                related.setdefault(row[query_name], []).append(
+                    plan.build(row)
+                )
+            return related
+
+        self.many.append((name, fetch))
+        self.getters.append((name, None))
+
+    def build(self, row, related=None):
+        return {
+            name: (related[name].get(row[self.pk], []) if getter is None
+                   else getter(row))
+            for name, getter in self.getters
+        }
+
+    def represent(self, rows):
+        """Данные ответа для строк values()."""
+        return list(self.iter_represent(rows))
+
+    def iter_represent(self, rows):
+        """Элементы ответа по одному; связи M2M читаются сразу."""
+        rows = list(rows)
+        ids = [row[self.pk] for row in rows]
+        related = {name: fetch(ids) for name, fetch in self.many}
+        return (self.build(row, related) for row in rows)
+
+
+class ValuesListMixin:
+    """Миксин вьюсета: list через values() и FieldPlan.
+
+    Колонки sparse_required_fields (SparseFieldsetMixin) тоже читаются:
+    по ним курсорная пагинация строит ссылки. Страницы от
+    JSON_STREAMING_MIN_ITEMS элементов отдаются потоком.
+    """
+
+    def get_field_plan(self):
+        """План для текущего сериализатора или None."""
+        if not settings.API_FAST_PATH:
+            return None
+        serializer = self.get_serializer()
+        try:
+            return FieldPlan(serializer, serializer.Meta.model)
+        except UnsupportedFieldError:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_field_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        columns = dict.fromkeys(
+            (*plan.columns, *getattr(self, 'sparse_required_fields', ()))
+        )
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(
+            None
+        ).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            with timing_phase(request, 'serialize'):
+                data = plan.represent(rows)
+            return Response(data)
+        if len(page) < settings.JSON_STREAMING_MIN_ITEMS:
+            with timing_phase(request, 'serialize'):
+                data = plan.represent(page)
+            return self.get_paginated_response(data)
+        # Потоком элементы строятся при рендеринге.
+        return StreamingJSONResponse(
+            self.get_paginated_response(plan.iter_represent(page)).data
+        )
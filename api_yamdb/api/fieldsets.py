@@ -0,0 +1,142 @@
+"""
+Частичные ответы: ?fields= и ?omit= для списков и карточек.
+
+Лишние поля убираются из сериализатора, а выборка ограничивается
+колонками и связями оставшихся полей (only, select_related,
+prefetch_related), так что ненужные колонки и связанные таблицы
+не читаются.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(request, param, available):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names - set(available)
+    if unknown:
+        raise ValidationError({param: [
+            f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+        ]})
+    return names
+
+
+def requested_fields(request, available):
+    """Имена полей по ?fields= и ?omit=; None — все поля."""
+    fields = parse_names(request, FIELDS_PARAM, available)
+    omit = parse_names(request, OMIT_PARAM, available)
+    if fields is None and omit is None:
+        return None
+    return (fields or set(available)) - (omit or set())
+
+
+def related_columns(field):
+    """Колонки связанной модели, нужные полю, или None (все)."""
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.ModelSerializer):
+        sources = [child.source for child in field.fields.values()]
+        if all('.' not in source and source != '*' for source in sources):
+            return sources
+        return None
+    slug_field = getattr(field, 'slug_field', None)
+    return [slug_field] if slug_field else None
+
+
+def prune_queryset(queryset, fields, required=()):
+    """Ограничить выборку колонками и связями полей сериализатора.
+
+    Если источник поля не сводится к полю модели, выборка возвращается
+    без изменений.
+    """
+    opts = queryset.model._meta
+    select_related = queryset.query.select_related
+    prefetch = {
+        getattr(lookup, 'prefetch_to', lookup): lookup
+        for lookup in queryset._prefetch_related_lookups
+    }
+    # Внешние ключи к уже известному родителю (self.title.reviews)
+    # читаются при создании каждого объекта.
+    only = {opts.pk.name, *required,
+            *(field.name for field in queryset._known_related_objects)}
+    related = []
+    lookups = []
+    for field in fields.values():
+        if field.source == '*' or '.' in field.source:
+            return queryset
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            return queryset
+        if model_field.many_to_many or model_field.one_to_many:
+            if field.source in prefetch:
+                lookups.append(prefetch[field.source])
+            continue
+        only.add(field.source)
+        if not model_field.is_relation or not (
+            select_related is True
+            or isinstance(select_related, dict)
+            and field.source in select_related
+        ):
+            continue
+        related.append(field.source)
+        columns = related_columns(field)
+        if columns is None:
+            return queryset
+        only.update(f'{field.source}__{column}' for column in columns)
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.prefetch_related(None).prefetch_related(
+        *lookups
+    ).only(*only)
+
+
+class SparseFieldsetMixin:
+    """Миксин вьюсета: ?fields= и ?omit= в list и retrieve.
+
+    sparse_required_fields — колонки, которые нужны вне сериализатора
+    (например, поля курсора пагинации).
+    """
+    sparse_actions = ('list', 'retrieve')
+    sparse_required_fields = ()
+
+    def sparse_fields(self):
+        """Поля сериализатора для ответа или None (все)."""
+        if (self.action not in self.sparse_actions
+                or self.request.method not in SAFE_METHODS):
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            serializer = self.get_serializer_class()(
+                context=self.get_serializer_context()
+            )
+            names = requested_fields(self.request, serializer.fields)
+            self._sparse_fields = None if names is None else {
+                name: field for name, field in serializer.fields.items()
+                if name in names
+            }
+        return self._sparse_fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.sparse_fields()
+        if fields is None:
+            return queryset
+        return prune_queryset(queryset, fields, self.sparse_required_fields)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - set(fields):
+                target.fields.pop(name)
+        return serializer
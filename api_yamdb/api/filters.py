@@ -1,15 +1,99 @@
 """Файл с фильтрами для приложения app."""
 
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
 from django_filters import CharFilter, FilterSet
+from rest_framework.filters import OrderingFilter
 from reviews.models import Title
 
+# Конфигурация полнотекстового поиска. Должна совпадать с выражением
+# GIN-индекса из миграции reviews.0004_title_search_indexes.
+SEARCH_CONFIG = 'simple'
+
+
+def search_titles_postgresql(queryset, value):
+    """Поиск по tsvector и триграммам с сортировкой по релевантности."""
+    vector = SearchVector('name', config=SEARCH_CONFIG)
+    query = SearchQuery(value, config=SEARCH_CONFIG)
+    # Каждое из условий обслуживается своим GIN-индексом (BitmapOr).
+    return queryset.annotate(
+        search_vector=vector,
+        search_rank=SearchRank(vector, query),
+        search_similarity=TrigramSimilarity('name', value),
+    ).filter(
+        Q(search_vector=query)
+        | Q(name__trigram_similar=value)
+        | Q(name__icontains=value)
+    ).order_by('-search_rank', '-search_similarity', 'id')
+
+
+def search_titles_fallback(queryset, value):
+    """Переносимый поиск по подстроке: точные, затем префиксные совпадения."""
+    return queryset.filter(name__icontains=value).annotate(
+        search_rank=Case(
+            When(name__iexact=value, then=Value(2)),
+            When(name__istartswith=value, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).order_by('-search_rank', 'id')
+
 
 class TitleFilter(FilterSet):
     """Класс фильтров для вьюсета модели Title."""
     name = CharFilter(field_name='name', lookup_expr='contains')
     category = CharFilter(field_name='category__slug', lookup_expr='exact')
     genre = CharFilter(field_name='genre__slug', lookup_expr='exact')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('name', 'category', 'genre', 'year',)
+        fields = ('name', 'category', 'genre', 'year', 'search',)
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию с сортировкой по релевантности."""
+        if connection.vendor == 'postgresql':
+            return search_titles_postgresql(queryset, value)
+        return search_titles_fallback(queryset, value)
+
+
+def ordering_expression(term):
+    """Выражение ORDER BY для поля сортировки произведений.
+
+    Произведения без оценок (rating IS NULL) считаются худшими. На
+    PostgreSQL NULL по умолчанию больше любого числа, поэтому порядок
+    задаётся явно и совпадает с индексом title_rating_idx
+    (rating NULLS FIRST, id) из миграции 0008.
+    """
+    field = term.lstrip('-')
+    if field != 'rating' or connection.vendor != 'postgresql':
+        return term
+    if term.startswith('-'):
+        return F(field).desc(nulls_last=True)
+    return F(field).asc(nulls_first=True)
+
+
+def order_titles(queryset, ordering):
+    """Отсортировать произведения с добавлением id для однозначности."""
+    ordering = list(ordering)
+    if not {'id', '-id'} & set(ordering):
+        ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+    return queryset.order_by(*map(ordering_expression, ordering))
+
+
+class TitleOrderingFilter(OrderingFilter):
+    """Сортировка произведений ?ordering= по индексированным полям.
+
+    К полю добавляется id в том же направлении, поэтому порядок
+    детерминирован и обслуживается составным индексом (поле, id).
+    Без параметра порядок queryset (id или релевантность поиска)
+    не меняется.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return order_titles(queryset, ordering)
@@ -0,0 +1,351 @@
+import json
+import platform
+import random
+import statistics
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import count
+
+from api.cache import bump_catalog_version
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from reviews.ratings import rebuild_comment_counts, rebuild_ratings
+from users.models import ADMIN, User
+
+# Метрики, рост которых сравнивается с базовым прогоном.
+REGRESSION_METRICS = ('p95_ms', 'queries')
+# Ожидаемые статусы ответов, по умолчанию 200.
+EXPECTED_STATUSES = {'auth_token': 400}
+# Лимит запросов без --throttle: ответы 429 не попадают в замеры,
+# а стоимость проверки лимита попадает.
+BENCHMARK_THROTTLE_RATE = '1000000/s'
+# Маршруты, пустая страница которых делает замеры бессмысленными.
+NON_EMPTY_ROUTES = ('titles_list', 'reviews_list', 'comments_list')
+
+
+class RollbackError(Exception):
+    """Откат данных бенчмарка."""
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: число и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    """Бенчмарк эндпоинтов api через тестовый клиент."""
+
+    help = ('Замеряет p50/p95/p99, пропускную способность, число и время '
+            'SQL-запросов для каждого маршрута api/urls.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000)
+        parser.add_argument('--reviews-per-title', type=int, default=10)
+        parser.add_argument('--comments-per-review', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Количество запросов на маршрут.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--use-existing',
+            action='store_true',
+            help='Не создавать данные, использовать текущую БД.',
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Не сбрасывать кеш каталога перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument('--baseline',
+                            help='JSON предыдущего прогона для сравнения.')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Допустимый относительный рост метрик (0.2 = 20%%).',
+        )
+        parser.add_argument('--only', nargs='*',
+                            help='Запустить только указанные маршруты.')
+        parser.add_argument(
+            '--throttle',
+            action='store_true',
+            help='Оставить лимиты DEFAULT_THROTTLE_RATES из настроек.',
+        )
+
+    def seed(self, options):
+        """Создаёт синтетические данные заданного размера."""
+        rng = random.Random(options['seed'])
+        reviewers = options['reviews_per_title']
+        User.objects.bulk_create(
+            User(username=f'bench_user{i}', email=f'bench_user{i}@yamdb.fake')
+            for i in range(max(reviewers, options['comments_per_review']))
+        )
+        users = list(User.objects.filter(username__startswith='bench_user'))
+        Category.objects.bulk_create(
+            Category(name=f'Категория {i}', slug=f'bench-category-{i}')
+            for i in range(10)
+        )
+        Genre.objects.bulk_create(
+            Genre(name=f'Жанр {i}', slug=f'bench-genre-{i}')
+            for i in range(20)
+        )
+        categories = list(Category.objects.filter(slug__startswith='bench-'))
+        genres = list(Genre.objects.filter(slug__startswith='bench-'))
+        Title.objects.bulk_create(
+            Title(
+                name=f'Произведение {i}',
+                year=rng.randint(1950, 2022),
+                description='Описание ' * rng.randint(1, 50),
+                category=rng.choice(categories),
+            )
+            for i in range(options['titles'])
+        )
+        titles = list(Title.objects.filter(name__startswith='Произведение'))
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title_id=title, genre_id=genre)
+            for title in titles
+            for genre in rng.sample(genres, 2)
+        )
+        Review.objects.bulk_create(
+            Review(title=title, author=author, text='Отзыв',
+                   score=rng.randint(1, 10))
+            for title in titles
+            for author in users[:reviewers]
+        )
+        review = Review.objects.filter(title=titles[0]).first()
+        Comment.objects.bulk_create(
+            Comment(review=review, author=author, text='Комментарий')
+            for author in users[:options['comments_per_review']]
+        )
+        # Отзывы и комментарии созданы в обход счётчиков.
+        rebuild_ratings()
+        rebuild_comment_counts()
+
+    def get_routes(self):
+        """Возвращает пары (имя, функция запроса) для маршрутов api."""
+        # Отзыв с комментариями, чтобы вложенные списки были не пустыми.
+        comment = (Comment.objects.select_related('review__title')
+                   .order_by('id').first())
+        genre = Genre.objects.order_by('id').first()
+        if comment is None or genre is None:
+            raise CommandError('В БД нет комментариев или жанров.')
+        review = comment.review
+        title = review.title
+        category = title.category.slug if title.category else ''
+        genre = genre.slug
+        admin = self.admin
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        signup_number = count()
+
+        def get(url):
+            return lambda client: client.get(url)
+
+        def signup(client):
+            number = next(signup_number)
+            return client.post('/api/v1/auth/signup/', {
+                'username': f'bench_signup{number}',
+                'email': f'bench_signup{number}@yamdb.fake',
+            })
+
+        def token(client):
+            return client.post('/api/v1/auth/token/', {
+                'username': admin.username,
+                'confirmation_code': 'invalid',
+            })
+
+        return (
+            ('titles_list', get('/api/v1/titles/')),
+            ('titles_filter_name', get('/api/v1/titles/?name=Произведение')),
+            ('titles_filter_category',
+             get(f'/api/v1/titles/?category={category}')),
+            ('titles_filter_genre', get(f'/api/v1/titles/?genre={genre}')),
+            ('titles_filter_year', get(f'/api/v1/titles/?year={title.year}')),
+            ('titles_search', get('/api/v1/titles/?search=Произведение')),
+            ('titles_cursor', get('/api/v1/titles/?pagination=cursor')),
+            ('titles_order_rating', get('/api/v1/titles/?ordering=-rating')),
+            ('titles_order_year', get('/api/v1/titles/?ordering=year')),
+            ('titles_order_name', get('/api/v1/titles/?ordering=name')),
+            ('title_detail', get(f'/api/v1/titles/{title.id}/')),
+            ('categories_list', get('/api/v1/categories/')),
+            ('genres_list', get('/api/v1/genres/')),
+            ('reviews_list', get(reviews_url)),
+            ('review_detail', get(f'{reviews_url}{review.id}/')),
+            ('comments_list', get(comments_url)),
+            ('users_list', get('/api/v1/users/')),
+            ('users_me', get('/api/v1/users/me/')),
+            ('auth_signup', signup),
+            ('auth_token', token),
+        )
+
+    def run_route(self, send, client, requests, warm_cache, expected):
+        """Выполняет запросы к маршруту и считает метрики."""
+        timings = []
+        queries = []
+        sql_times = []
+        statuses = Counter()
+        started = time.perf_counter()
+        for _ in range(requests):
+            if not warm_cache:
+                bump_catalog_version()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                request_started = time.perf_counter()
+                response = send(client)
+                timings.append(time.perf_counter() - request_started)
+            statuses[response.status_code] += 1
+            queries.append(timer.count)
+            sql_times.append(timer.seconds)
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        return {
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p95_ms': percentile(timings, 95) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'rps': requests / elapsed if elapsed else 0.0,
+            'queries': statistics.mean(queries),
+            'sql_ms': statistics.mean(sql_times) * 1000,
+            'unexpected_statuses': {
+                str(code): number for code, number in statuses.items()
+                if code != expected
+            },
+        }
+
+    def throttle_settings(self, throttle):
+        """Настройки лимитов запросов на время замеров."""
+        if throttle:
+            return nullcontext()
+        rates = {
+            scope: BENCHMARK_THROTTLE_RATE
+            for scope in api_settings.DEFAULT_THROTTLE_RATES
+        }
+        return override_settings(REST_FRAMEWORK=dict(
+            settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates
+        ))
+
+    def benchmark(self, options):
+        self.admin = User.objects.create(
+            username='bench_admin', email='bench_admin@yamdb.fake',
+            role=ADMIN,
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}'
+        )
+        results = {}
+        for name, send in self.get_routes():
+            if options['only'] and name not in options['only']:
+                continue
+            response = send(client)
+            if name in NON_EMPTY_ROUTES and not response.data['results']:
+                raise CommandError(
+                    f'{name}: пустая страница, замеры недостоверны.'
+                )
+            results[name] = self.run_route(
+                send, client, options['requests'], options['warm_cache'],
+                EXPECTED_STATUSES.get(name, 200),
+            )
+            self.stdout.write(self.format_result(name, results[name]))
+        return results
+
+    def format_result(self, name, result):
+        return (f'{name:24} p50={result["p50_ms"]:7.2f} мс '
+                f'p95={result["p95_ms"]:7.2f} мс '
+                f'p99={result["p99_ms"]:7.2f} мс '
+                f'rps={result["rps"]:8.1f} '
+                f'sql={result["queries"]:5.1f} '
+                f'({result["sql_ms"]:.2f} мс)'
+                + ''.join(f' {code}x{number}' for code, number
+                          in result['unexpected_statuses'].items()))
+
+    def compare(self, results, baseline_path, threshold):
+        """Возвращает список регрессий относительно базового прогона."""
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)['routes']
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            for metric in REGRESSION_METRICS:
+                old = baseline[name][metric]
+                new = result[metric]
+                if new > old * (1 + threshold) and new - old > 1e-9:
+                    regressions.append(
+                        f'{name}.{metric}: {old:.2f} -> {new:.2f}'
+                    )
+        return regressions
+
+    def handle(self, *args, **options):
+        results = {}
+        try:
+            with transaction.atomic():
+                if not options['use_existing']:
+                    self.seed(options)
+                with self.throttle_settings(options['throttle']):
+                    results = self.benchmark(options)
+                raise RollbackError
+        except RollbackError:
+            pass
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'options': {
+                    key: options[key] for key in (
+                        'titles', 'reviews_per_title', 'comments_per_review',
+                        'requests', 'seed', 'use_existing', 'warm_cache',
+                        'throttle',
+                    )
+                },
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        failed = [
+            f'{name}: {result["unexpected_statuses"]}'
+            for name, result in results.items()
+            if result['unexpected_statuses']
+        ]
+        if failed:
+            raise CommandError(
+                'Неожиданные статусы ответов, замеры недостоверны:\n'
+                + '\n'.join(failed)
+            )
+        if options['baseline']:
+            regressions = self.compare(
+                results, options['baseline'], options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write('Регрессий относительно базового прогона нет.')
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    index = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
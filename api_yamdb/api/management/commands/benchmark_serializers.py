@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from api.fastpath import FieldPlan
+from api.renderers import FastJSONRenderer
+from api.serializers import (CommentSerializer, ReviewSerializer,
+                             TitleListSerializer)
+from api.views import TitleViewSet
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from reviews.models import Comment, Review
+
+
+class Command(BaseCommand):
+    """Сравнение сериализации списков: DRF и быстрый путь."""
+
+    help = ('Сериализует списки произведений, отзывов и комментариев '
+            'сериализаторами DRF с JSONRenderer и быстрым путём '
+            '(api.fastpath, api.renderers), проверяет побайтное '
+            'совпадение и сравнивает время.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Объектов в одном списке.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def get_cases(self):
+        return (
+            ('titles', TitleListSerializer, TitleViewSet.queryset),
+            ('reviews', ReviewSerializer,
+             Review.objects.select_related('title', 'author').order_by('id')),
+            ('comments', CommentSerializer,
+             Comment.objects.select_related('review', 'author')
+             .order_by('id')),
+        )
+
+    def serializer_path(self, serializer_class, queryset):
+        started = time.perf_counter()
+        data = serializer_class(list(queryset), many=True).data
+        serialized = time.perf_counter()
+        content = JSONRenderer().render(data)
+        return content, serialized - started, time.perf_counter() - serialized
+
+    def fast_path(self, serializer_class, queryset):
+        started = time.perf_counter()
+        plan = FieldPlan(serializer_class(), queryset.model)
+        data = plan.represent(
+            queryset.prefetch_related(None).values(*plan.columns)
+        )
+        serialized = time.perf_counter()
+        content = FastJSONRenderer().render(data)
+        return content, serialized - started, time.perf_counter() - serialized
+
+    def measure(self, path, serializer_class, queryset, repeat):
+        """Ответ и медианы времени сериализации и рендеринга, в мс."""
+        runs = [path(serializer_class, queryset.all())
+                for _ in range(repeat)]
+        return (
+            runs[0][0],
+            statistics.median(run[1] for run in runs) * 1000,
+            statistics.median(run[2] for run in runs) * 1000,
+        )
+
+    def handle(self, *args, **options):
+        for name, serializer_class, queryset in self.get_cases():
+            queryset = queryset[:options['rows']]
+            if not queryset.exists():
+                self.stdout.write(f'{name}: нет данных, пропущено.')
+                continue
+            slow, slow_serialize, slow_render = self.measure(
+                self.serializer_path, serializer_class, queryset,
+                options['repeat'],
+            )
+            fast, fast_serialize, fast_render = self.measure(
+                self.fast_path, serializer_class, queryset,
+                options['repeat'],
+            )
+            if slow != fast:
+                raise CommandError(f'{name}: ответы различаются.')
+            slow_total = slow_serialize + slow_render
+            fast_total = fast_serialize + fast_render
+            self.stdout.write(
+                f'{name:9} объектов={len(queryset):5} '
+                f'DRF={slow_serialize:7.2f}+{slow_render:6.2f} мс '
+                f'быстрый={fast_serialize:7.2f}+{fast_render:6.2f} мс '
+                f'ускорение={slow_total / fast_total:4.1f}x'
+            )
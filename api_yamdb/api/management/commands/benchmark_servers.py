@@ -0,0 +1,155 @@
+import http.client
+import json
+import os
+import subprocess
+import threading
+import time
+from itertools import cycle
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from reviews.models import Review, Title
+
+from .benchmark_api import percentile
+
+SERVERS = {
+    'wsgi': 'api_yamdb.wsgi:application',
+    'asgi': 'api_yamdb.asgi:application',
+}
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности WSGI и ASGI под нагрузкой."""
+
+    help = ('Запускает локально gunicorn с синхронными воркерами и в '
+            'ASGI-режиме (api.asgi) и нагружает горячие пути чтения '
+            'с высокой конкурентностью.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='*', default=list(SERVERS),
+                            choices=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Воркеров gunicorn на сервер.')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Одновременных клиентов.')
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Всего запросов на режим.')
+        parser.add_argument(
+            '--asgi-worker',
+            default='uvicorn.workers.UvicornWorker',
+            help='Класс воркера gunicorn для ASGI (без uvloop: '
+                 'uvicorn.workers.UvicornH11Worker).',
+        )
+        parser.add_argument('--port', type=int, default=8700)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+
+    def get_paths(self):
+        title = Title.objects.filter(reviews__isnull=False).first()
+        if title is None:
+            title = Title.objects.order_by('id').first()
+        if title is None:
+            raise CommandError('В БД нет произведений.')
+        return (
+            '/api/v1/titles/',
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{title.id}/reviews/',
+        )
+
+    def start_server(self, mode, port, options):
+        worker_class = (options['asgi_worker'] if mode == 'asgi'
+                        else 'sync')
+        process = subprocess.Popen(
+            ('gunicorn', SERVERS[mode], '--worker-class', worker_class,
+             '--bind', f'127.0.0.1:{port}',
+             '--workers', str(options['workers']),
+             '--log-level', 'warning'),
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                connection.request('GET', '/api/v1/titles/')
+                connection.getresponse().read()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'Сервер {mode} не запустился.')
+
+    def load(self, port, paths, concurrency, total):
+        """Нагрузка из concurrency потоков с keep-alive соединениями."""
+        timings = []
+        errors = []
+        counter = iter(range(total))
+        lock = threading.Lock()
+
+        def client():
+            connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                    timeout=60)
+            for path in cycle(paths):
+                with lock:
+                    if next(counter, None) is None:
+                        break
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    (timings if ok else errors).append(elapsed)
+            connection.close()
+
+        threads = [threading.Thread(target=client)
+                   for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        if not timings:
+            raise CommandError('Все запросы завершились ошибкой.')
+        return {
+            'rps': len(timings) / elapsed,
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p95_ms': percentile(timings, 95) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'errors': len(errors),
+        }
+
+    def handle(self, *args, **options):
+        paths = self.get_paths()
+        self.stdout.write(
+            f'Произведений: {Title.objects.count()}, отзывов: '
+            f'{Review.objects.count()}, клиентов: {options["concurrency"]}.'
+        )
+        results = {}
+        for number, mode in enumerate(options['modes']):
+            port = options['port'] + number
+            process = self.start_server(mode, port, options)
+            try:
+                results[mode] = self.load(
+                    port, paths, options['concurrency'], options['requests']
+                )
+            finally:
+                process.terminate()
+                process.wait()
+            result = results[mode]
+            self.stdout.write(
+                f'{mode}: rps={result["rps"]:8.1f} '
+                f'p50={result["p50_ms"]:7.1f} мс '
+                f'p95={result["p95_ms"]:7.1f} мс '
+                f'p99={result["p99_ms"]:7.1f} мс '
+                f'ошибок={result["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,238 @@
+"""
+Middleware приложения api.
+"""
+
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.cache import patch_vary_headers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .compression import choose_encoding, compress, compress_stream
+from .db_router import choose_replica, close_if_unusable, set_replica
+
+logger = logging.getLogger('api.timing')
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL: считает запросы, время и дубликаты."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values()
+                   if count > 1)
+
+
+@contextmanager
+def timing_phase(request, phase):
+    """Добавить время блока к фазе phase в Server-Timing запроса.
+
+    Вне выборки RequestTimingMiddleware ничего не замеряет.
+    """
+    timing = getattr(request, 'timing', None)
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing[phase] = (timing.get(phase, 0.0)
+                         + time.perf_counter() - started)
+
+
+class RequestTimingMiddleware:
+    """Замеряет SQL, время вью, сериализации и рендеринга.
+
+    Для запросов из выборки (REQUEST_TIMING_SAMPLE_RATE) добавляет
+    заголовок Server-Timing и пишет в лог api.timing медленные запросы
+    (дольше REQUEST_TIMING_SLOW_MS) с именем вьюсета и действия.
+    Сериализация (serializer.data, см. timing_phase) входит во время
+    вью, рендеринг — только перевод данных в JSON.
+    Запросы вне выборки проходят без накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request.timing = {'view_name': None}
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        timing = request.timing
+        view = timing.get('view', total)
+        serialize = timing.get('serialize', 0.0)
+        render = timing.get('render', 0.0)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={recorder.duration * 1000:.2f};'
+            f'desc="{recorder.count} queries, '
+            f'{recorder.duplicates} duplicates"',
+            f'view;dur={view * 1000:.2f}',
+            f'serialize;dur={serialize * 1000:.2f}',
+            f'render;dur={render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+        if total * 1000 >= settings.REQUEST_TIMING_SLOW_MS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.1f мс, вью %.1f мс, '
+                'сериализация %.1f мс, рендер %.1f мс, SQL %s запросов '
+                'за %.1f мс, дубликатов %s',
+                request.method, request.get_full_path(),
+                timing['view_name'], total * 1000, view * 1000,
+                serialize * 1000, render * 1000, recorder.count,
+                recorder.duration * 1000,
+                recorder.duplicates,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, 'timing', None)
+        if timing is None:
+            return
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is not None:
+            actions = getattr(view_func, 'actions', None) or {}
+            action = actions.get(request.method.lower(),
+                                 request.method.lower())
+            timing['view_name'] = f'{view_class.__name__}.{action}'
+        else:
+            timing['view_name'] = getattr(view_func, '__name__', None)
+        timing['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, 'timing', None)
+        if timing is None or 'view_started' not in timing:
+            return response
+        render_started = time.perf_counter()
+        timing['view'] = render_started - timing['view_started']
+
+        def rendered(response):
+            timing['render'] = time.perf_counter() - render_started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def client_key(request):
+    """Ключ клиента для read-your-writes: токен или адрес.
+
+    Адрес определяется как у лимитов запросов: за nginx REMOTE_ADDR —
+    адрес прокси, а клиент берётся из X-Forwarded-For (NUM_PROXIES).
+    """
+    identity = (request.META.get('HTTP_AUTHORIZATION')
+                or BaseThrottle().get_ident(request))
+    return 'replica:sticky:' + md5(identity.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтение вьюх api на реплики (api.db_router).
+
+    Безопасные запросы к вьюхам api.views читают из реплики, выбранной
+    на весь запрос. После успешного небезопасного запроса клиент
+    REPLICA_STICKY_SECONDS читает из default, чтобы видеть свои записи
+    несмотря на задержку репликации. Постоянное соединение с default
+    проверяется в начале запроса (DB_CONN_HEALTH_CHECKS).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        close_if_unusable(DEFAULT_DB_ALIAS)
+        try:
+            response = self.get_response(request)
+        finally:
+            set_replica(None)
+        if (request.method not in SAFE_METHODS
+                and settings.DATABASE_REPLICAS
+                and 200 <= response.status_code < 300):
+            caches[settings.REPLICA_CACHE_ALIAS].set(
+                client_key(request), True, settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS
+                or view_class is None
+                or view_class.__module__ != 'api.views'):
+            return
+        if caches[settings.REPLICA_CACHE_ALIAS].get(client_key(request)):
+            return
+        set_replica(choose_replica())
+
+
+class CompressionMiddleware:
+    """Сжимает ответы gzip или brotli (api.compression).
+
+    Сжимаются JSON, NDJSON и текстовые ответы; обычные ответы короче
+    COMPRESSION_MIN_SIZE отдаются как есть, потоковые сжимаются
+    по частям.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (response.has_header('Content-Encoding')
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                encoding, response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            content = compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
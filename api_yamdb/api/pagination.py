@@ -0,0 +1,172 @@
+"""
+Пагинаторы для приложения api.
+"""
+
+from functools import partial
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы queryset по статистике PostgreSQL.
+
+    None для других СУБД и для таблиц без собранной статистики.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] <= 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedPage(Page):
+    """Страница, наличие следующей страницы у которой известно заранее."""
+
+    def __init__(self, object_list, number, paginator, next_exists):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = next_exists
+
+    def has_next(self):
+        return self.next_exists
+
+
+class CountedPaginator(Paginator):
+    """Paginator с количеством объектов, известным без COUNT(*).
+
+    Точному количеству (exact) доверяется как COUNT(*). Оценка
+    только попадает в ответ: номер страницы ею не ограничивается,
+    а следующая страница ищется по лишней строке выборки.
+    """
+
+    def __init__(self, object_list, per_page, count=None, exact=True,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.exact = exact
+        if count is not None:
+            self.count = count
+
+    def validate_number(self, number):
+        if self.exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        if self.exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return EstimatedPage(objects[:self.per_page], number, self,
+                             next_exists=len(objects) > self.per_page)
+
+
+class CountedPagination(PageNumberPagination):
+    """Постраничная пагинация с количеством объектов от вьюхи.
+
+    Если get_pagination_count(queryset) вьюхи возвращает пару
+    (количество, точное ли оно), COUNT(*) не выполняется.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        get_count = getattr(view, 'get_pagination_count', None)
+        known = get_count(queryset) if get_count is not None else None
+        count, exact = (None, True) if known is None else known
+        self.django_paginator_class = partial(CountedPaginator,
+                                              count=count, exact=exact)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class PageSizeMixin:
+    """Размер страницы из ?page_size= (не больше MAX_PAGE_SIZE)."""
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class TitleCursorPagination(PageSizeMixin, CursorPagination):
+    """Курсорная пагинация произведений по id.
+
+    Keyset по неуникальным полям (rating, year) вырождается в OFFSET,
+    поэтому из параметров ?ordering= поддерживаются только id и -id.
+    """
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(
+            OrderingFilter().get_ordering(request, queryset, view)
+            or self.ordering
+        )
+        if ordering not in (('id',), ('-id',)):
+            raise ValidationError(
+                {'ordering': ['Курсорная пагинация поддерживает только '
+                              'сортировку по id.']}
+            )
+        return ordering
+
+
+class PubDateCursorPagination(PageSizeMixin, CursorPagination):
+    """Курсорная пагинация отзывов и комментариев по (pub_date, id)."""
+    ordering = ('-pub_date', '-id')
+
+
+class OptionalCursorPagination(PageSizeMixin, CountedPagination):
+    """Постраничная пагинация с курсорным режимом по запросу клиента.
+
+    По умолчанию ответ совпадает с CountedPagination. С параметром
+    ?pagination=cursor (или при наличии ?cursor=) используется
+    keyset-пагинация без COUNT(*) и OFFSET.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_pagination_class = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == self.cursor_mode
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class TitlePagination(OptionalCursorPagination):
+    """Пагинация произведений."""
+    cursor_pagination_class = TitleCursorPagination
+
+
+class PubDatePagination(OptionalCursorPagination):
+    """Пагинация отзывов и комментариев."""
+    cursor_pagination_class = PubDateCursorPagination
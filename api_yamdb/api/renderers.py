@@ -0,0 +1,130 @@
+"""
+Быстрый JSON-рендерер на orjson и потоковые JSON-ответы.
+
+Вывод побайтно совпадает с rest_framework.renderers.JSONRenderer
+(компактный, ensure_ascii=False, с экранированием U+2028 и U+2029).
+Если orjson не установлен, данные ему не подходят (целые вне int64,
+нестроковые ключи) или в выводе может быть float в записи, отличной
+от repr(), рендерит JSONRenderer.
+
+StreamingJSONResponse отдаёт список results частями: элементы
+сериализуются по мере отправки, и весь ответ в памяти не собирается.
+"""
+
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Запись float, которая у orjson может отличаться от repr():
+# 1e16 вместо 1e+16, 1e-7 вместо 1e-07, 0.00001 вместо 1e-05.
+# Шаблон начинается с литерала, поэтому поиск по тексту быстрый.
+EXPONENT = re.compile(rb'e-?[0-9]')
+DIGITS = frozenset(b'0123456789')
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'),
+                   (b'\xe2\x80\xa9', b'\\u2029'))
+
+encoder = JSONEncoder()
+
+
+def float_mismatch(content):
+    """Может ли запись float в content отличаться от repr()."""
+    if b'0.0000' in content:
+        return True
+    return any(content[match.start() - 1] in DIGITS
+               for match in EXPONENT.finditer(content))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer с сериализацией через orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or not settings.API_FAST_PATH
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {})):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            # Даты и прочие типы — как в JSONEncoder из DRF.
+            content = orjson.dumps(
+                data, default=encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            content = None
+        if content is None or float_mismatch(content):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        if b'\xe2\x80' in content:
+            for separator, escaped in LINE_SEPARATORS:
+                content = content.replace(separator, escaped)
+        return content
+
+    def iter_render(self, data, accepted_media_type=None,
+                    renderer_context=None):
+        """Рендерить частями; склейка частей совпадает с render(data).
+
+        Список (или results последним ключом страницы) отдаётся
+        частями по JSON_STREAMING_BATCH_SIZE элементов.
+        """
+        is_page = isinstance(data, dict)
+        if (self.get_indent(accepted_media_type, renderer_context or {})
+                or is_page and list(data)[-1:] != ['results']):
+            yield self.render(data, accepted_media_type, renderer_context)
+            return
+        if is_page:
+            head = self.render(dict(data, results=[]), accepted_media_type,
+                               renderer_context)
+            items, prefix, suffix = data['results'], head[:-2], head[-2:]
+        else:
+            items, prefix, suffix = data, b'[', b']'
+        items = iter(items)
+        separator = b''
+        yield prefix
+        while True:
+            batch = list(islice(items, settings.JSON_STREAMING_BATCH_SIZE))
+            if not batch:
+                break
+            # Список рендерится в [a,b,...]: скобки отрезаются.
+            yield separator + self.render(batch, accepted_media_type,
+                                          renderer_context)[1:-1]
+            separator = b','
+        yield suffix
+
+
+class StreamingJSONResponse(Response):
+    """Ответ DRF, который отдаётся частями через iter_render.
+
+    Данные могут содержать генератор элементов. Если выбранный
+    рендерер не умеет рендерить частями, ответ рендерится целиком.
+    """
+
+    def render(self):
+        renderer = self.accepted_renderer
+        if not hasattr(renderer, 'iter_render'):
+            return super().render()
+        response = StreamingHttpResponse(
+            renderer.iter_render(self.data, self.accepted_media_type,
+                                 self.renderer_context),
+            status=self.status_code,
+        )
+        for header, value in self.items():
+            response[header] = value
+        response['Content-Type'] = (
+            f'{renderer.media_type}; charset={renderer.charset}'
+            if renderer.charset else renderer.media_type
+        )
+        # Не буферизовать поток в nginx.
+        response['X-Accel-Buffering'] = 'no'
+        for callback in self._post_render_callbacks:
+            callback(response)
+        return response
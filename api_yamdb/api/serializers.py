@@ -4,13 +4,27 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.core.exceptions import ValidationError
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from reviews.models import Category, Comment, Genre, Review, Title
 from users.models import User
 from users.validators import validate_username
 
+from .middleware import timing_phase
+
+
+class TimedDataMixin:
+    """Миксин сериализатора: время serializer.data — фаза serialize
+    в Server-Timing (RequestTimingMiddleware)."""
+
+    @property
+    def data(self):
+        with timing_phase(self.context.get('request'), 'serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """ListSerializer с замером serializer.data."""
+
 
 class SignUpSerializer(serializers.Serializer):
     """Сериализатор для регистрации."""
@@ -32,11 +46,12 @@ class TokenSerializer(serializers.Serializer):
     confirmation_code = serializers.CharField(required=True)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор для модели User."""
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = (
             'username',
             'email',
@@ -47,43 +62,48 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор для модели Category."""
 
     class Meta:
         model = Category
+        list_serializer_class = TimedListSerializer
         fields = ('name', 'slug',)
         lookup_field = 'slug'
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор для модели Genre."""
 
     class Meta:
         model = Genre
+        list_serializer_class = TimedListSerializer
         fields = ('name', 'slug',)
         lookup_field = 'slug'
 
 
-class TitleListSerializer(serializers.ModelSerializer):
+class TitleListSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор вывода записей модели Title."""
     genre = GenreSerializer(read_only=True, many=True)
     category = CategorySerializer(read_only=True)
     rating = serializers.IntegerField(read_only=True)
+    reviews_count = serializers.IntegerField(source='rating_count',
+                                             read_only=True)
 
     class Meta:
         model = Title
+        list_serializer_class = TimedListSerializer
         fields = (
-            'id', 'name', 'year', 'rating',
+            'id', 'name', 'year', 'rating', 'reviews_count',
             'description', 'genre', 'category',
         )
         read_only_fields = (
-            'id', 'name', 'year', 'rating',
+            'id', 'name', 'year', 'rating', 'reviews_count',
             'description', 'genre', 'category',
         )
 
 
-class TitleCreateSerializer(serializers.ModelSerializer):
+class TitleCreateSerializer(TimedDataMixin, serializers.ModelSerializer):
     """Сериализатор создания записей модели Title."""
     genre = serializers.SlugRelatedField(
         queryset=Genre.objects.all(),
@@ -109,8 +129,50 @@ class TitleCreateSerializer(serializers.ModelSerializer):
                                               'года.')
         return year
 
+    def update(self, instance, validated_data):
+        # Только изменённые поля: рейтинг меняется UPDATE
+        # с F-выражениями и не должен перезаписываться.
+        genres = validated_data.pop('genre', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        if genres is not None:
+            instance.genre.set(genres)
+        return instance
+
+
+class RatingStatsSerializer(serializers.Serializer):
+    """Сериализатор статистики оценок произведения."""
+    count = serializers.IntegerField()
+    mean = serializers.FloatField(allow_null=True)
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+
+class TitleBulkSerializer(TitleCreateSerializer):
+    """Сериализатор элемента массового создания произведений.
+
+    Слаги жанров и категории проверяются во вьюхе одним запросом
+    на весь массив.
+    """
+    genre = serializers.ListField(child=serializers.SlugField())
+    category = serializers.SlugField()
+
+    class Meta:
+        model = Title
+        fields = ('name', 'year', 'description', 'genre', 'category',)
+
+
+class ReviewBulkSerializer(serializers.Serializer):
+    """Сериализатор элемента массового импорта отзывов."""
+    title = serializers.IntegerField()
+    author = serializers.CharField(max_length=settings.MAX_USERNAME_LENGTH)
+    text = serializers.CharField()
+    score = serializers.IntegerField(min_value=1, max_value=10)
+    pub_date = serializers.DateTimeField(required=False)
+
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedDataMixin, serializers.ModelSerializer):
     title = serializers.SlugRelatedField(
         slug_field='name',
         read_only=True
@@ -127,24 +189,23 @@ class ReviewSerializer(serializers.ModelSerializer):
             )
         return value
 
-    def validate(self, data):
-        request = self.context['request']
-        author = request.user
-        title_id = self.context.get('view').kwargs.get('title_id')
-        title = get_object_or_404(Title, pk=title_id)
-        if (
-            request.method == 'POST'
-            and Review.objects.filter(title=title, author=author).exists()
-        ):
-            raise ValidationError('Можно оставить только один отзыв')
-        return data
+    def update(self, instance, validated_data):
+        # Только изменённые поля: comments_count меняется UPDATE
+        # с F-выражением и не должен перезаписываться.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
     class Meta:
         model = Review
-        fields = ('id', 'title', 'text', 'author', 'score', 'pub_date',)
+        list_serializer_class = TimedListSerializer
+        fields = ('id', 'title', 'text', 'author', 'score', 'pub_date',
+                  'comments_count',)
+        read_only_fields = ('comments_count',)
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedDataMixin, serializers.ModelSerializer):
     review = serializers.SlugRelatedField(
         slug_field='text',
         read_only=True
@@ -156,4 +217,5 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'review', 'text', 'author', 'pub_date',)
@@ -0,0 +1,44 @@
+"""
+Обработчики сигналов приложения api.
+"""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from reviews.models import Category, Genre, GenreTitle, Review, Title
+from users.models import User
+
+from .authentication import invalidate_user
+from .cache import bump_catalog_version
+
+CATALOG_MODELS = (Title, Genre, Category, GenreTitle, Review)
+
+
+def catalog_changed(**kwargs):
+    """Сбросить кеш каталога сразу и ещё раз после фиксации транзакции.
+
+    Повторный сброс нужен, чтобы ответ, закешированный другим запросом
+    до фиксации (например, со старым денормализованным рейтингом),
+    не остался в кеше.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def user_changed(instance, **kwargs):
+    """Сбросить кеш аутентификации изменённого пользователя."""
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+def connect_signals():
+    for model in CATALOG_MODELS:
+        post_save.connect(catalog_changed, sender=model,
+                          dispatch_uid=f'catalog_save_{model.__name__}')
+        post_delete.connect(catalog_changed, sender=model,
+                            dispatch_uid=f'catalog_delete_{model.__name__}')
+    m2m_changed.connect(catalog_changed, sender=Title.genre.through,
+                        dispatch_uid='catalog_title_genre')
+    post_save.connect(user_changed, sender=User,
+                      dispatch_uid='auth_user_save')
+    post_delete.connect(user_changed, sender=User,
+                        dispatch_uid='auth_user_delete')
@@ -0,0 +1,1014 @@
+"""
+Тесты приложения api.
+
+Каждый маршрут из api/urls.py должен выполнять постоянное число
+SQL-запросов независимо от размера страницы (QueryCountTest).
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import warnings
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from reviews.bulk import insert_rows
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, TitleReviewBucket)
+from reviews.ratings import (rebuild_comment_counts, rebuild_ratings,
+                             trending_window_start)
+from users.models import ADMIN, User
+
+from .asgi import AsyncReadApplication, is_read_path
+from .authentication import local_user_cache
+from .compression import (COMPRESSORS, brotli, choose_encoding, compress,
+                          compress_stream)
+from .db_router import (ReplicaRouter, choose_replica, current_replica,
+                        set_replica, unavailable_until)
+from .middleware import ReplicaRoutingMiddleware
+from .renderers import FastJSONRenderer
+from .serializers import TitleCreateSerializer
+from .throttling import SlidingWindowThrottle, local_counter_store
+from .views import ReviewBulkView, TitleViewSet
+
+TITLES_COUNT = 15
+GENRES_PER_TITLE = 2
+REVIEWS_COUNT = 15
+COMMENTS_COUNT = 15
+
+
+class CatalogTestCase(TestCase):
+    """Общие данные и проверки для тестов эндпоинтов api."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            username='admin', email='admin@yamdb.ru', role=ADMIN
+        )
+        User.objects.bulk_create(
+            User(username=f'author{i}', email=f'author{i}@yamdb.ru')
+            for i in range(REVIEWS_COUNT)
+        )
+        authors = list(User.objects.filter(username__startswith='author'))
+        category = Category.objects.create(name='Фильм', slug='movie')
+        genres = [
+            Genre.objects.create(name=f'Жанр {i}', slug=f'genre{i}')
+            for i in range(GENRES_PER_TITLE)
+        ]
+        for i in range(TITLES_COUNT):
+            title = Title.objects.create(
+                name=f'Произведение {i}', year=2000, description='',
+                category=category,
+            )
+            GenreTitle.objects.bulk_create(
+                GenreTitle(title_id=title, genre_id=genre) for genre in genres
+            )
+        cls.title = title
+        for author in authors:
+            review = Review.objects.create(
+                title=cls.title, author=author, text='Отзыв', score=5
+            )
+        cls.review = review
+        for author in authors[:COMMENTS_COUNT]:
+            cls.comment = Comment.objects.create(
+                review=cls.review, author=author, text='Комментарий'
+            )
+        # Отзывы и комментарии созданы в обход счётчиков.
+        rebuild_ratings()
+        rebuild_comment_counts()
+        cls.title.refresh_from_db()
+        cls.review.refresh_from_db()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assert_queries(self, url, expected):
+        """Проверить число запросов и успешный ответ для url."""
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def count_queries(self, url):
+        """Вернуть число запросов, выполненных при GET на url."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context.captured_queries)
+
+    @staticmethod
+    def without_savepoints(context):
+        """Вернуть число запросов без SAVEPOINT/RELEASE от TestCase."""
+        return sum(
+            1 for query in context.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE',
+                                            'ROLLBACK'))
+        )
+
+
+class QueryCountTest(CatalogTestCase):
+    """Проверка отсутствия N+1 запросов в эндпоинтах api."""
+
+    def test_titles(self):
+        self.assert_queries('/api/v1/titles/', 3)
+        self.assert_queries(f'/api/v1/titles/{self.title.id}/', 2)
+        self.assert_queries('/api/v1/titles/?genre=genre0', 3)
+        self.assert_queries('/api/v1/titles/?category=movie', 3)
+
+    def test_categories_and_genres(self):
+        self.assert_queries('/api/v1/categories/', 2)
+        self.assert_queries('/api/v1/genres/', 2)
+
+    def test_users(self):
+        self.assert_queries('/api/v1/users/', 2)
+        self.assert_queries(f'/api/v1/users/{self.admin.username}/', 1)
+        self.assert_queries('/api/v1/users/me/', 0)
+
+    def test_reviews(self):
+        url = f'/api/v1/titles/{self.title.id}/reviews/'
+        # Количество отзывов берётся из произведения, без COUNT(*).
+        self.assert_queries(url, 2)
+        self.assert_queries(f'{url}{self.review.id}/', 2)
+
+    def test_comments(self):
+        url = (f'/api/v1/titles/{self.title.id}/reviews/{self.review.id}'
+               f'/comments/')
+        self.assert_queries(url, 2)
+        self.assert_queries(f'{url}{self.comment.id}/', 2)
+
+    def test_auth(self):
+        data = {'username': 'newcomer', 'email': 'newcomer@yamdb.ru'}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/v1/auth/signup/', data)
+        self.assertEqual(response.status_code, 200)
+        # Поиск пользователя, его создание и постановка письма в очередь.
+        self.assertEqual(self.without_savepoints(context), 3)
+        user = User.objects.get(username='newcomer')
+        data = {'username': 'newcomer',
+                'confirmation_code': default_token_generator.make_token(user)}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/v1/auth/token/', data)
+        self.assertEqual(response.status_code, 200)
+        # Поиск и активация пользователя.
+        self.assertEqual(self.without_savepoints(context), 2)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        urls = (
+            '/api/v1/titles/',
+            f'/api/v1/titles/{self.title.id}/reviews/',
+            f'/api/v1/titles/{self.title.id}/reviews/{self.review.id}'
+            f'/comments/',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # На первой странице 10 записей, на второй — 5.
+                self.assertEqual(
+                    self.count_queries(f'{url}?page=1'),
+                    self.count_queries(f'{url}?page=2'),
+                )
+
+    def test_cursor_pagination_skips_count(self):
+        url = f'/api/v1/titles/{self.title.id}/reviews/?pagination=cursor'
+        response = self.assert_queries(url, 2)
+        self.assertNotIn('count', response.data)
+        self.assert_queries(response.data['next'], 2)
+        self.assert_queries('/api/v1/titles/?pagination=cursor', 2)
+
+    def test_nested_create(self):
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'text': 'Отзыв', 'score': 7})
+        self.assertEqual(response.status_code, 201)
+        # Произведение, вставка отзыва, обновление рейтинга, строки
+        # гистограммы и почасового счётчика (по одному INSERT ... ON
+        # CONFLICT DO UPDATE): счётчики поддерживаются при записи, чтобы
+        # чтение обходилось без агрегации отзывов.
+        self.assertEqual(self.without_savepoints(context), 5)
+
+        response = self.client.post(url, {'text': 'Ещё', 'score': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'],
+                         ['Можно оставить только один отзыв'])
+
+        comments_url = f'{url}{self.review.id}/comments/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(comments_url, {'text': 'Чужой'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.without_savepoints(context), 1)
+
+        comments_url = (f'/api/v1/titles/{self.title.id}/reviews/'
+                        f'{self.review.id}/comments/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(comments_url, {'text': 'Текст'})
+        self.assertEqual(response.status_code, 201)
+        # Отзыв, вставка комментария и обновление счётчика отзыва.
+        self.assertEqual(self.without_savepoints(context), 3)
+
+
+class ReadPathTest(CatalogTestCase):
+    """Сортировка, выбор полей и быстрый путь чтения."""
+
+    def test_ordering(self):
+        Title.objects.filter(pk=self.title.pk).update(rating=7)
+        response = self.assert_queries('/api/v1/titles/?ordering=-rating', 3)
+        self.assertEqual(response.data['results'][0]['id'], self.title.id)
+        # Количество произведений уже в кеше.
+        response = self.assert_queries('/api/v1/titles/?ordering=-year', 2)
+        ids = [title['id'] for title in response.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        response = self.client.get(
+            '/api/v1/titles/?pagination=cursor&ordering=year'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stable_page_order(self):
+        reviews = f'/api/v1/titles/{self.title.id}/reviews/'
+        urls = ('/api/v1/users/', '/api/v1/categories/', '/api/v1/genres/',
+                reviews, f'{reviews}{self.review.id}/comments/')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+        results = self.client.get(reviews).data['results']
+        ids = [review['id'] for review in results]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_sparse_fieldsets(self):
+        reviews = f'/api/v1/titles/{self.title.id}/reviews/'
+        cases = (
+            ('/api/v1/titles/?fields=id,name,rating', 2,
+             {'id', 'name', 'rating'}, 'description'),
+            # Количество произведений уже в кеше.
+            ('/api/v1/titles/?omit=description,genre', 1,
+             {'id', 'name', 'year', 'rating', 'reviews_count', 'category'},
+             'description'),
+            (f'/api/v1/titles/{self.title.id}/?fields=name', 1,
+             {'name'}, 'category'),
+            (f'{reviews}?fields=id,score', 2, {'id', 'score'}, 'users_user'),
+            (f'{reviews}{self.review.id}/comments/?omit=text,author', 2,
+             {'id', 'review', 'pub_date'}, 'users_user'),
+        )
+        for url, expected, fields, skipped in cases:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.assert_queries(url, expected)
+                data = response.data
+                item = data['results'][0] if 'results' in data else data
+                self.assertEqual(set(item), fields)
+                self.assertNotIn(skipped, queries.captured_queries[-1]['sql'])
+        response = self.client.get('/api/v1/titles/?fields=id,unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_fast_path_matches_serializers(self):
+        reviews = f'/api/v1/titles/{self.title.id}/reviews/'
+        urls = (
+            '/api/v1/titles/',
+            '/api/v1/titles/?page=2&ordering=-year',
+            '/api/v1/titles/?pagination=cursor',
+            '/api/v1/titles/?fields=name,genre,category',
+            reviews,
+            f'{reviews}?pagination=cursor',
+            f'{reviews}{self.review.id}/comments/?omit=review',
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                fast = self.client.get(url).content
+                cache.clear()
+                with override_settings(API_FAST_PATH=False):
+                    self.assertEqual(self.client.get(url).content, fast)
+
+
+class ResponseCompressionTest(CatalogTestCase):
+    """Сжатие и потоковая отдача больших страниц."""
+
+    @override_settings(JSON_STREAMING_MIN_ITEMS=5)
+    def test_compression_and_streaming(self):
+        url = f'/api/v1/titles/?page_size={TITLES_COUNT}'
+        response = self.assert_queries(url, 3)
+        self.assertTrue(response.streaming)
+        plain = b''.join(response.streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain
+        )
+        with override_settings(API_FAST_PATH=False):
+            self.assertEqual(self.client.get(url).content, plain)
+        url = '/api/v1/titles/?page_size=3'
+        plain = self.client.get(url).content
+        with override_settings(COMPRESSION_MIN_SIZE=len(plain) + 1):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(COMPRESSION_MIN_SIZE=len(plain)):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(gzip.decompress(response.content), plain)
+
+
+class ExportTest(CatalogTestCase):
+    """Потоковая выгрузка каталога."""
+
+    @override_settings(EXPORT_CHUNK_SIZE=5)
+    def test_export(self):
+        response = self.client.get('/api/v1/titles/export/?reviews=1')
+        # По запросу произведений, жанров и отзывов на пачку
+        # и пустая последняя пачка.
+        with self.assertNumQueries(10):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), TITLES_COUNT)
+        self.assertEqual(len(json.loads(lines[-1])['reviews']),
+                         REVIEWS_COUNT)
+        self.assertEqual(json.loads(lines[0])['reviews'], [])
+        response = self.client.get('/api/v1/titles/export/?output=csv')
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()),
+            TITLES_COUNT + 1,
+        )
+        response = self.client.get(
+            '/api/v1/titles/export/?output=csv&reviews=1'
+        )
+        # Заголовок, произведения без отзывов и по строке на отзыв.
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()),
+            1 + TITLES_COUNT - 1 + REVIEWS_COUNT,
+        )
+
+
+class CatalogCacheTest(CatalogTestCase):
+    """Кеш каталога и количества записей."""
+
+    def test_catalog_cache(self):
+        self.assert_queries('/api/v1/titles/', 3)
+        self.assert_queries('/api/v1/titles/', 0)
+        self.assert_queries('/api/v1/genres/', 2)
+        self.assert_queries('/api/v1/genres/', 0)
+        Genre.objects.create(name='Новый жанр', slug='new')
+        self.assert_queries('/api/v1/titles/', 3)
+        response = self.assert_queries('/api/v1/genres/', 2)
+        self.assertEqual(response.data['count'], GENRES_PER_TITLE + 1)
+
+    def test_no_detail_routes(self):
+        for url in ('/api/v1/categories/movie/', '/api/v1/genres/genre0/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 405)
+
+    @patch('api.cache.estimate_count', return_value=10 ** 6)
+    def test_estimated_count(self, estimate_count):
+        response = self.assert_queries('/api/v1/titles/', 2)
+        self.assertEqual(response.data['count'], 10 ** 6)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']),
+                         TITLES_COUNT - 10)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            self.client.get('/api/v1/titles/?page=3').status_code, 404
+        )
+        estimate_count.assert_called_once()
+
+
+class ServerTimingTest(CatalogTestCase):
+    """Заголовок Server-Timing и журнал медленных запросов."""
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0,
+                       REQUEST_TIMING_SLOW_MS=0)
+    def test_server_timing(self):
+        with self.assertLogs('api.timing', 'WARNING') as logs:
+            response = self.client.get('/api/v1/titles/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="3 queries, 0 duplicates"',
+                      response['Server-Timing'])
+        self.assertIn('TitleViewSet.list', logs.output[0])
+        for url in ('/api/v1/titles/', '/api/v1/genres/',
+                    f'/api/v1/titles/{self.title.id}/'):
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertLogs('api.timing', 'WARNING'):
+                    timing = self.client.get(url)['Server-Timing']
+                durations = dict(re.findall(r'(\w+);dur=([\d.]+)', timing))
+                self.assertGreater(float(durations['serialize']), 0)
+                self.assertLessEqual(float(durations['serialize']),
+                                     float(durations['view']))
+
+
+class RatingTest(CatalogTestCase):
+    """Рейтинги, гистограммы и счётчики отзывов и комментариев."""
+
+    def test_rating_stats(self):
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        review_id = self.client.post(
+            url, {'text': 'Отзыв', 'score': 7}
+        ).data['id']
+        self.client.force_authenticate(User.objects.get(username='author0'))
+        self.client.post(url, {'text': 'Отзыв', 'score': 4})
+        self.client.force_authenticate(self.admin)
+        self.client.patch(f'{url}{review_id}/', {'score': 9})
+        stats_url = f'/api/v1/titles/{title.id}/rating-stats/'
+        response = self.assert_queries(stats_url, 1)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['mean'], 6.5)
+        self.assertEqual(response.data['histogram']['9'], 1)
+        self.assertEqual(response.data['histogram']['7'], 0)
+        self.client.delete(f'{url}{review_id}/')
+        response = self.assert_queries(stats_url, 1)
+        self.assertEqual(response.data['mean'], 4.0)
+        self.assertEqual(
+            self.client.get('/api/v1/titles/0/rating-stats/').status_code, 404
+        )
+
+    def test_counters(self):
+        comments_url = (f'/api/v1/titles/{self.title.id}/reviews/'
+                        f'{self.review.id}/comments/')
+        response = self.client.get(f'/api/v1/titles/{self.title.id}/')
+        self.assertEqual(response.data['reviews_count'], REVIEWS_COUNT)
+        response = self.client.post(comments_url, {'text': 'Текст'})
+        comment_id = response.data['id']
+        response = self.client.get(comments_url)
+        self.assertEqual(response.data['count'], COMMENTS_COUNT + 1)
+        self.client.patch(
+            f'/api/v1/titles/{self.title.id}/reviews/{self.review.id}/',
+            {'score': 9},
+        )
+        self.client.delete(f'{comments_url}{comment_id}/')
+        # Удаление автора убирает его отзыв и комментарий.
+        author = self.review.comments.order_by('id')[0].author
+        self.client.delete(f'/api/v1/users/{author.username}/')
+        response = self.client.get(f'/api/v1/titles/{self.title.id}/')
+        self.assertEqual(response.data['reviews_count'], REVIEWS_COUNT - 1)
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.score, self.review.comments_count),
+                         (9, Comment.objects.filter(review=self.review)
+                          .count()))
+        self.assertEqual(self.review.comments_count, COMMENTS_COUNT - 1)
+
+    def test_rows_written_past_counters(self):
+        # Отзывы, созданные через ORM, не увеличивают счётчик,
+        # но попадают в список.
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        for author in User.objects.order_by('id')[:3]:
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=5)
+        response = self.client.get(
+            f'/api/v1/titles/{title.id}/reviews/?page_size=2'
+        )
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def assert_rating(self, title, rating, count):
+        title.refresh_from_db()
+        self.assertEqual((title.rating, title.rating_count), (rating, count))
+
+    def test_rating_invariants(self):
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        author = User.objects.get(username='author0')
+        self.client.force_authenticate(author)
+        review_id = self.client.post(
+            url, {'text': 'Отзыв', 'score': 8}
+        ).data['id']
+        self.client.force_authenticate(self.admin)
+        admin_review_id = self.client.post(
+            url, {'text': 'Отзыв', 'score': 3}
+        ).data['id']
+        self.assert_rating(title, 5, 2)
+        self.client.patch(f'{url}{admin_review_id}/', {'score': 5})
+        self.assert_rating(title, 6, 2)
+        self.client.delete(f'{url}{admin_review_id}/')
+        self.assert_rating(title, 8, 1)
+        self.client.delete(f'/api/v1/users/{author.username}/')
+        self.assert_rating(title, None, 0)
+        self.assertFalse(Review.objects.filter(pk=review_id).exists())
+
+    def test_title_update_keeps_rating(self):
+        title = Title.objects.create(name='Новое', year=2000, description='',
+                                     category=self.title.category)
+        # Экземпляр загружен до того, как рейтинг изменился в базе.
+        stale = Title.objects.get(pk=title.pk)
+        self.client.post(f'/api/v1/titles/{title.id}/reviews/',
+                         {'text': 'Отзыв', 'score': 9})
+        serializer = TitleCreateSerializer(
+            stale, data={'name': 'Другое', 'genre': ['genre0']}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assert_rating(title, 9, 1)
+        self.assertEqual(title.name, 'Другое')
+        self.assertEqual([genre.slug for genre in title.genre.all()],
+                         ['genre0'])
+
+
+class LeaderboardTest(CatalogTestCase):
+    """Лучшие и популярные произведения."""
+
+    def test_leaderboards(self):
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        self.client.post(f'/api/v1/titles/{title.id}/reviews/',
+                         {'text': 'Отзыв', 'score': 9})
+        response = self.assert_queries('/api/v1/titles/top/', 2)
+        self.assertEqual(response.data[0]['id'], title.id)
+        # Только чтение: счётчики за окном не удаляются.
+        response = self.assert_queries('/api/v1/titles/trending/', 3)
+        self.assertEqual(response.data[0]['id'], title.id)
+        self.assertEqual(response.data[0]['recent_reviews'], 1)
+        # Повторные запросы в пределах допустимого устаревания из кеша.
+        self.assert_queries('/api/v1/titles/top/', 0)
+        self.assert_queries('/api/v1/titles/trending/', 0)
+
+    def test_prune_trending(self):
+        title = Title.objects.create(name='Новое', year=2000, description='')
+        old = trending_window_start() - timedelta(hours=1)
+        TitleReviewBucket.objects.create(title=title, hour=old, count=3)
+        call_command('rebuild_trending', prune_only=True,
+                     stdout=io.StringIO())
+        self.assertFalse(TitleReviewBucket.objects.filter(hour=old).exists())
+
+
+class BenchmarkApiTest(TestCase):
+    """Команда benchmark_api на небольшом наборе данных."""
+
+    def setUp(self):
+        cache.clear()
+        local_counter_store.clear()
+
+    def benchmark(self, *routes, **options):
+        """Запустить бенчмарк и вернуть результаты из --output."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark_api', titles=3, reviews_per_title=2,
+                         comments_per_review=1, requests=3, only=routes,
+                         output=output, stdout=io.StringIO(), **options)
+            with open(output, encoding='utf-8') as file:
+                return json.load(file)['routes']
+
+    def test_metrics(self):
+        results = self.benchmark('titles_list', 'auth_token')
+        self.assertEqual(set(results), {'titles_list', 'auth_token'})
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['sql_ms'], 0)
+            self.assertEqual(result['unexpected_statuses'], {})
+
+    def test_nested_lists(self):
+        results = self.benchmark('reviews_list', 'comments_list')
+        # Произведение или отзыв и непустая страница.
+        for result in results.values():
+            self.assertEqual(result['queries'], 2)
+
+    @patch.dict(api_settings.DEFAULT_THROTTLE_RATES,
+                {'signup.ip': '2/min', 'token.ip': '2/min'})
+    def test_throttled_routes(self):
+        routes = ('auth_signup', 'auth_token')
+        results = self.benchmark(*routes)
+        for route in routes:
+            self.assertEqual(results[route]['unexpected_statuses'], {})
+        local_counter_store.clear()
+        with self.assertRaisesMessage(CommandError, 'auth_signup'):
+            self.benchmark(*routes, throttle=True)
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Проверка кеша пользователей при JWT-аутентификации."""
+
+    def setUp(self):
+        local_user_cache.clear()
+        self.user = User.objects.create(username='reader',
+                                        email='reader@yamdb.ru')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+
+    def test_cached_user_lookup(self):
+        self.client.get('/api/v1/users/me/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/users/me/')
+        self.assertEqual(response.data['role'], 'user')
+
+    def test_role_change_invalidates_cache(self):
+        self.client.get('/api/v1/users/me/')
+        self.assertEqual(self.client.get('/api/v1/users/').status_code, 403)
+        self.user.role = ADMIN
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/users/').status_code, 200)
+
+
+@patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {
+    'signup.ip': '2/min', 'reviews.user': '2/min', 'reviews.ip': '3/min',
+})
+class ThrottlingTest(TestCase):
+    """Лимиты запросов со скользящим окном (api.throttling)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.title = Title.objects.create(name='Фильм', year=2000)
+        cls.users = [
+            User.objects.create(username=f'writer{i}',
+                                email=f'writer{i}@yamdb.ru')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        local_counter_store.clear()
+        self.client = APIClient()
+        self.url = f'/api/v1/titles/{self.title.id}/reviews/'
+
+    def post_review(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post(self.url, {}).status_code
+
+    @patch.object(SlidingWindowThrottle, 'timer', Mock(return_value=60))
+    def test_signup(self):
+        responses = [self.client.post('/api/v1/auth/signup/', {})
+                     for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses],
+                         [400, 400, 429])
+        # Текущее окно станет прошлым и войдёт в период с весом 1/3.
+        self.assertEqual(responses[-1]['Retry-After'], '100')
+        SlidingWindowThrottle.timer.return_value = 160
+        self.assertEqual(
+            self.client.post('/api/v1/auth/signup/', {}).status_code, 400
+        )
+
+    @patch.object(SlidingWindowThrottle, 'timer', Mock(return_value=60))
+    def test_sliding_window(self):
+        user = self.users[0]
+        self.assertEqual([self.post_review(user) for _ in range(3)],
+                         [400, 400, 429])
+        # Прошлое окно учитывается с весом 1/3: 3 / 3 + 1 <= 2.
+        SlidingWindowThrottle.timer.return_value = 160
+        self.assertEqual(self.post_review(user), 400)
+        self.assertEqual(self.post_review(user), 429)
+
+    @patch.object(SlidingWindowThrottle, 'timer', Mock(return_value=60))
+    def test_user_and_ip_scopes(self):
+        first, second, third = self.users
+        self.assertEqual(self.post_review(first), 400)
+        self.assertEqual(self.post_review(first), 400)
+        self.assertEqual(self.post_review(second), 400)
+        # Лимит на IP исчерпан для всех пользователей.
+        self.assertEqual(self.post_review(third), 429)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(THROTTLE_CACHE_ALIAS='default')
+    @patch.object(SlidingWindowThrottle, 'timer', Mock(return_value=60))
+    def test_cache_store(self):
+        self.assertEqual([self.post_review(self.users[0]) for _ in range(3)],
+                         [400, 400, 429])
+        self.assertEqual(local_counter_store.counters, {})
+
+
+class BulkCreateTest(TestCase):
+    """Проверка массового создания произведений и отзывов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            username='admin', email='admin@yamdb.ru', role=ADMIN
+        )
+        cls.author = User.objects.create(username='author',
+                                         email='author@yamdb.ru')
+        Category.objects.create(name='Фильм', slug='movie')
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Комедия', slug='comedy')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_titles(self):
+        items = [
+            {'name': f'Фильм {i}', 'year': 2000, 'description': 'Описание',
+             'genre': ['drama', 'comedy'], 'category': 'movie'}
+            for i in range(20)
+        ]
+        # Жанры, категории, вставка произведений, их id (без RETURNING)
+        # и вставка связей с жанрами — независимо от числа элементов.
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/v1/titles/bulk/', items,
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CatalogTestCase.without_savepoints(context), 5)
+        self.assertEqual(Title.objects.count(), 20)
+        self.assertEqual(GenreTitle.objects.count(), 40)
+        self.assertEqual(
+            [title['id'] for title in response.data],
+            list(Title.objects.order_by('id').values_list('id', flat=True)),
+        )
+        self.assertEqual(
+            Title.objects.get(pk=response.data[3]['id']).name, 'Фильм 3'
+        )
+
+        items[1]['genre'] = ['drama', 'horror']
+        items[2]['category'] = 'book'
+        response = self.client.post('/api/v1/titles/bulk/', items,
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('genre', response.data[1])
+        self.assertIn('category', response.data[2])
+        self.assertEqual(Title.objects.count(), 20)
+
+    def test_reviews(self):
+        title = Title.objects.create(name='Фильм', year=2000, description='')
+        items = [
+            {'title': title.id, 'author': 'admin', 'text': 'Отзыв',
+             'score': 10, 'pub_date': '2020-01-01T00:00:00Z'},
+            {'title': title.id, 'author': 'author', 'text': 'Отзыв',
+             'score': 5},
+        ]
+
+        def multi_row_insert(*args, **kwargs):
+            # Путь PostgreSQL: на SQLite insert_rows вызывает executemany.
+            with patch.object(connection, 'vendor', 'postgresql'):
+                return insert_rows(*args, **kwargs)
+
+        with patch('api.views.insert_rows', multi_row_insert):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post('/api/v1/reviews/bulk/', items,
+                                            format='json')
+        self.assertEqual(response.status_code, 201)
+        inserts = [
+            query for query in context.captured_queries
+            if 'INSERT INTO "reviews_review"' in query['sql']
+        ]
+        # Один запрос на массив, а не на каждый отзыв.
+        self.assertEqual(len(inserts), 1)
+        self.assertTrue(inserts[0]['sql'].startswith('INSERT'))
+        title.refresh_from_db()
+        self.assertEqual((title.rating_count, title.rating), (2, 7))
+        self.assertEqual(
+            Review.objects.get(author=self.admin).pub_date.year, 2020
+        )
+        stats = self.client.get(f'/api/v1/titles/{title.id}/rating-stats/')
+        self.assertEqual(stats.data['histogram']['10'], 1)
+
+        response = self.client.post('/api/v1/reviews/bulk/', items[:1],
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0]['non_field_errors'],
+                         ['Можно оставить только один отзыв'])
+
+    def test_concurrent_review(self):
+        title = Title.objects.create(name='Фильм', year=2000, description='')
+        create = ReviewBulkView.create
+
+        def race_then_create(view, items):
+            # Параллельный запрос успел после проверок resolve.
+            Review.objects.create(title=title, author=self.author,
+                                  text='Отзыв', score=1)
+            return create(view, items)
+
+        items = [{'title': title.id, 'author': 'author', 'text': 'Отзыв',
+                  'score': 5}]
+        with patch.object(ReviewBulkView, 'create', race_then_create):
+            response = self.client.post('/api/v1/reviews/bulk/', items,
+                                        format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'],
+                         ['Можно оставить только один отзыв'])
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post('/api/v1/titles/bulk/', [],
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncReadApplicationTest(SimpleTestCase):
+    """Проверка маршрутизации и ограничений ASGI-режима."""
+
+    def call(self, application, path):
+        """Выполнить GET через ASGI-приложение, вернуть статус.
+
+        Отправленные сообщения сохраняются в self.messages.
+        """
+        self.messages = messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': path,
+                 'query_string': b'', 'http_version': '1.1', 'headers': []}
+        asyncio.run(application(scope, receive, send))
+        return messages[0]['status']
+
+    def test_read_paths(self):
+        for path in ('/api/v1/titles/', '/api/v1/titles/1/',
+                     '/api/v1/titles/1/reviews/'):
+            self.assertTrue(is_read_path({'method': 'GET', 'path': path}))
+        self.assertFalse(is_read_path({'method': 'POST',
+                                       'path': '/api/v1/titles/'}))
+        self.assertFalse(is_read_path({'method': 'GET',
+                                       'path': '/api/v1/users/'}))
+
+    def test_streaming(self):
+        threads = set()
+
+        def chunks():
+            for chunk in (b'[1', b'', b',2', b']'):
+                threads.add(threading.get_ident())
+                yield chunk
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return chunks()
+
+        self.assertEqual(
+            self.call(AsyncReadApplication(wsgi_application),
+                      '/api/v1/titles/'),
+            200,
+        )
+        messages = self.messages
+        # Части ответа отправляются по отдельности, без буферизации.
+        self.assertEqual([message['body'] for message in messages[1:]],
+                         [b'[1', b',2', b']', b''])
+        self.assertFalse(messages[-1].get('more_body'))
+        self.assertEqual(len(threads), 1)
+
+    @override_settings(ASGI_MAX_CONCURRENCY=1, ASGI_MAX_QUEUE=0)
+    def test_overload(self):
+        application = AsyncReadApplication(get_wsgi_application())
+        application.semaphore = asyncio.Semaphore(0)
+        self.assertEqual(self.call(application, '/api/v1/titles/'), 503)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    """Вывод FastJSONRenderer совпадает с JSONRenderer."""
+
+    def test_same_output(self):
+        values = (
+            {'text': 'Отзыв \u2028 \u2029 "\\ \x01', 'score': 10},
+            [1.5, 0.1, 1e16, 2.5e-05, 1e-07, None, True, 2 ** 70],
+            {1: 'ключ', 'when': datetime(2022, 1, 2, 3, 4, 5, 678901)},
+            {'mean': Decimal('7.25'), 'ids': (1, 2)},
+            None,
+        )
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(FastJSONRenderer().render(value),
+                                 JSONRenderer().render(value))
+
+
+class CompressionTest(SimpleTestCase):
+    """Выбор кодировки и потоковый рендеринг."""
+
+    def test_choose_encoding(self):
+        cases = (
+            ('', None),
+            ('gzip', 'gzip'),
+            ('gzip;q=0, identity', None),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('*', next(iter(COMPRESSORS))),
+        )
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+    @override_settings(JSON_STREAMING_BATCH_SIZE=2)
+    def test_iter_render(self):
+        values = (
+            [],
+            [{'id': 1}, None, 'строка \u2028', 1.5, 2],
+            {'count': 3, 'next': None, 'results': [{'id': 1}, {'id': 2}]},
+            {'results': [], 'count': 0},
+        )
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(
+                    b''.join(FastJSONRenderer().iter_render(value)),
+                    JSONRenderer().render(value),
+                )
+
+    def test_compress_stream(self):
+        chunks = [b'{"id":%d},' % number for number in range(5000)]
+        for encoding in COMPRESSORS:
+            with self.subTest(encoding=encoding):
+                parts = list(compress_stream(encoding, iter(chunks)))
+                self.assertGreater(len(parts), 2)
+                self.assertEqual(self.decompress(encoding, b''.join(parts)),
+                                 b''.join(chunks))
+                self.assertEqual(
+                    self.decompress(encoding, compress(encoding, chunks[0])),
+                    chunks[0],
+                )
+
+    @staticmethod
+    def decompress(encoding, content):
+        if encoding == 'gzip':
+            return gzip.decompress(content)
+        return brotli.decompress(content)
+
+
+class ReplicaRoutingTest(SimpleTestCase):
+    """Чтение из реплик и read-your-writes (api.db_router)."""
+
+    def setUp(self):
+        cache.clear()
+        unavailable_until.clear()
+        self.seen = []
+        self.status = 200
+
+        def view(request):
+            self.seen.append(ReplicaRouter().db_for_read(Title))
+            return HttpResponse(status=self.status)
+
+        view.cls = TitleViewSet
+
+        def get_response(request):
+            self.middleware.process_view(request, view, (), {})
+            return view(request)
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+        self.factory = RequestFactory()
+
+    def request(self, method, token='first', **extra):
+        if token is not None:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.middleware(getattr(self.factory, method)(
+            '/api/v1/titles/', **extra
+        ))
+        return self.seen[-1]
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    @patch('api.middleware.choose_replica', return_value='replica')
+    def test_read_your_writes(self, choose_replica):
+        self.assertEqual(self.request('get'), 'replica')
+        self.assertIsNone(current_replica())
+        self.assertIsNone(self.request('post'))
+        self.assertIsNone(self.request('get'))
+        self.assertEqual(self.request('get', token='second'), 'replica')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    @patch('api.middleware.choose_replica', return_value='replica')
+    def test_anonymous_behind_proxy(self, choose_replica):
+        # Анонимные клиенты за одним прокси различаются по
+        # X-Forwarded-For.
+        first = {'token': None, 'REMOTE_ADDR': '10.0.0.1',
+                 'HTTP_X_FORWARDED_FOR': '203.0.113.1'}
+        second = dict(first, HTTP_X_FORWARDED_FOR='203.0.113.2')
+        self.request('post', **first)
+        self.assertIsNone(self.request('get', **first))
+        self.assertEqual(self.request('get', **second), 'replica')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    @patch('api.middleware.choose_replica', return_value='replica')
+    def test_failed_write(self, choose_replica):
+        self.status = 400
+        self.request('post')
+        self.status = 200
+        self.assertEqual(self.request('get'), 'replica')
+
+    def test_without_replicas(self):
+        self.assertIsNone(self.request('get'))
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_unavailable_replica(self):
+        with patch('api.db_router.check_connection',
+                   return_value=False) as check:
+            self.assertIsNone(choose_replica())
+            self.assertIsNone(choose_replica())
+        check.assert_called_once_with('replica')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_writes_and_migrations(self):
+        router = ReplicaRouter()
+        set_replica('replica')
+        try:
+            self.assertEqual(router.db_for_write(Title), 'default')
+        finally:
+            set_replica(None)
+        self.assertTrue(router.allow_migrate('default', 'reviews'))
+        self.assertFalse(router.allow_migrate('replica', 'reviews'))
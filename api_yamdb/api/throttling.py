@@ -0,0 +1,177 @@
+"""
+Ограничение частоты запросов для приложения api.
+
+Алгоритм — скользящее окно по двум счётчикам: текущего и прошлого
+окна длиной в период лимита. Число запросов за последний период
+оценивается как счётчик текущего окна плюс доля прошлого, ещё
+попадающая в период. На запрос — один инкремент и одно чтение.
+
+Счётчики хранятся в памяти процесса или, если задан
+THROTTLE_CACHE_ALIAS, в общем кеше из CACHES: тогда лимит общий
+для всех воркеров. Отклонённые запросы тоже учитываются, поэтому
+клиент, который продолжает слать запросы, остаётся ограниченным.
+
+Лимиты задаются во вьюхе атрибутом throttle_scope и ключами
+'<scope>.ip' и '<scope>.user' в DEFAULT_THROTTLE_RATES.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LocalCounterStore:
+    """Потокобезопасные счётчики процесса со временем жизни."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def purge(self, now):
+        self.counters = {
+            key: entry for key, entry in self.counters.items()
+            if entry[1] > now
+        }
+        # Если все счётчики живые, лимиты теряются, но память — нет.
+        if len(self.counters) >= self.max_size:
+            self.counters.clear()
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self.lock:
+            count, expires = self.counters.get(key, (0, 0))
+            if expires <= now:
+                count, expires = 0, now + timeout
+                if len(self.counters) >= self.max_size:
+                    self.purge(now)
+            self.counters[key] = (count + 1, expires)
+            return count + 1
+
+    def get(self, key):
+        entry = self.counters.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return 0
+        return entry[0]
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+
+
+class CacheCounterStore:
+    """Счётчики в кеше Django; incr атомарен в memcached и redis."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def incr(self, key, timeout):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, timeout):
+                return 1
+            return self.cache.incr(key)
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+
+local_counter_store = LocalCounterStore(
+    max_size=settings.THROTTLE_LOCAL_MAX_SIZE
+)
+
+
+def counter_store():
+    """Хранилище счётчиков по настройке THROTTLE_CACHE_ALIAS."""
+    if settings.THROTTLE_CACHE_ALIAS is None:
+        return local_counter_store
+    return CacheCounterStore(caches[settings.THROTTLE_CACHE_ALIAS])
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Лимит '<throttle_scope>.<kind>' со скользящим окном.
+
+    Подклассы задают kind и get_ident_key(request) — ключ клиента.
+    Вьюхи без throttle_scope или без лимита для своей области
+    не ограничиваются.
+    """
+
+    kind = None
+    timer = time.time
+
+    def __init__(self):
+        # Область и лимит известны только по вьюхе (allow_request).
+        pass
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        self.scope = f'{scope}.{self.kind}'
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        self.window_end = (window + 1) * self.duration
+        self.weight = 1 - offset / self.duration
+        key = f'throttle:{self.scope}:{self.get_ident_key(request)}'
+        store = counter_store()
+        # Счётчик живёт своё окно и следующее, где он — прошлый.
+        self.current = store.incr(f'{key}:{int(window)}',
+                                  2 * self.duration)
+        self.previous = store.get(f'{key}:{int(window) - 1}')
+        return (self.previous * self.weight + self.current
+                <= self.num_requests)
+
+    def wait(self):
+        """Секунды, через которые следующий запрос уложится в лимит."""
+        spare = self.num_requests - self.current - 1
+        if spare >= 0:
+            # Уложится в этом окне, когда доля прошлого уменьшится.
+            weight = spare / self.previous
+            return max(0, self.window_end - self.now
+                       - weight * self.duration)
+        # Текущее окно станет прошлым.
+        weight = (self.num_requests - 1) / self.current
+        return (self.window_end - self.now
+                + (1 - weight) * self.duration)
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """Лимит на IP-адрес клиента (с учётом NUM_PROXIES)."""
+
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Лимит на пользователя; для анонимов — на IP-адрес."""
+
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+
+class WriteThrottleMixin:
+    """Миксин вьюсета: ограничивать только изменяющие запросы."""
+
+    def get_throttles(self):
+        if self.request.method in SAFE_METHODS:
+            return []
+        return super().get_throttles()
@@ -5,8 +5,8 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    ReviewViewSet, SignUpView, TitleViewSet, TokenView,
-                    UserViewSet)
+                    ReviewBulkView, ReviewViewSet, SignUpView, TitleBulkView,
+                    TitleViewSet, TokenView, UserViewSet)
 
 router_v1 = DefaultRouter()
 router_v1.register('users', UserViewSet)
@@ -25,6 +25,9 @@ router_v1.register(
 )
 
 urlpatterns = [
+    # Раньше роутера: иначе titles/bulk/ совпадёт с titles/{pk}/.
+    path('v1/titles/bulk/', TitleBulkView.as_view()),
+    path('v1/reviews/bulk/', ReviewBulkView.as_view()),
     path('v1/', include(router_v1.urls)),
     path('v1/auth/signup/', SignUpView.as_view()),
     path('v1/auth/token/', TokenView.as_view()),
@@ -1,37 +1,55 @@
-from api.filters import TitleFilter
+from api.filters import TitleFilter, TitleOrderingFilter
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db import IntegrityError
-from django.db.models import Avg
+from django.db import IntegrityError, connection, transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import AccessToken
-from reviews.models import Category, Genre, Review, Title
+from reviews.bulk import insert_rows
+from reviews.leaderboards import top_titles, trending_title_counts
+from reviews.models import Category, Genre, GenreTitle, Review, Title
+from reviews.ratings import (comment_created, comment_deleted,
+                             comments_deleted, rating_stats, review_created,
+                             review_deleted, review_updated, reviews_created,
+                             reviews_deleted)
+from users.mail_queue import enqueue_mail
 from users.models import User
 
+from .cache import (CatalogCacheMixin, CatalogDetailCacheMixin,
+                    bump_catalog_version, get_leaderboard)
+from .export import CONTENT_TYPES, EXPORTERS
+from .fastpath import ValuesListMixin
+from .fieldsets import SparseFieldsetMixin
+from .pagination import CountedPagination, PubDatePagination, TitlePagination
 from .permissions import (IsAdminOrSuperuser, IsAdminSuperUserOrReadOnly,
                           IsStaffAuthorOrReadOnly)
 from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer, SignUpSerializer,
+                          GenreSerializer, RatingStatsSerializer,
+                          ReviewBulkSerializer, ReviewSerializer,
+                          SignUpSerializer, TitleBulkSerializer,
                           TitleCreateSerializer, TitleListSerializer,
                           TokenSerializer, UserSerializer)
+from .throttling import IPRateThrottle, UserRateThrottle, WriteThrottleMixin
 
 
-class ListCreateDeleteViewSet(mixins.ListModelMixin,
+class ListCreateDeleteViewSet(CatalogCacheMixin,
+                              mixins.ListModelMixin,
                               mixins.CreateModelMixin,
                               mixins.DestroyModelMixin,
                               viewsets.GenericViewSet):
     """Кастомный вьюсет на GET/POST/DELETE."""
-    pagination_class = PageNumberPagination
+    pagination_class = CountedPagination
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     search_fields = ('name',)
     lookup_field = 'slug'
@@ -40,6 +58,8 @@ class ListCreateDeleteViewSet(mixins.ListModelMixin,
 
 class SignUpView(APIView):
     """Регистрация пользователя."""
+    throttle_classes = (IPRateThrottle,)
+    throttle_scope = 'signup'
 
     def post(self, request):
         serializer = SignUpSerializer(data=request.data)
@@ -54,7 +74,7 @@ class SignUpView(APIView):
         except IntegrityError:
             raise ValidationError(detail='Username или Email уже занят.')
         confirmation_code = default_token_generator.make_token(user)
-        send_mail(
+        enqueue_mail(
             subject='Signup confirmation',
             message=f'Ваш код подтверждения: "{confirmation_code}".',
             from_email=settings.FROM_EMAIL,
@@ -69,6 +89,8 @@ class SignUpView(APIView):
 
 class TokenView(APIView):
     """Получение JWT-токена."""
+    throttle_classes = (IPRateThrottle,)
+    throttle_scope = 'token'
 
     def post(self, request):
         serializer = TokenSerializer(data=request.data)
@@ -92,7 +114,7 @@ class TokenView(APIView):
 class UserViewSet(viewsets.ModelViewSet):
     """Вьюсет для модели User."""
 
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('username')
     permission_classes = (IsAdminOrSuperuser,)
     serializer_class = UserSerializer
     lookup_field = 'username'
@@ -116,13 +138,23 @@ class UserViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            reviews_deleted(instance.reviews.all())
+            comments_deleted(instance.comments.all())
+            instance.delete()
 
-class TitleViewSet(viewsets.ModelViewSet):
+
+class TitleViewSet(CatalogDetailCacheMixin, SparseFieldsetMixin,
+                   ValuesListMixin, viewsets.ModelViewSet):
     """Вьюсет для модели Title."""
-    queryset = Title.objects.annotate(rating=Avg('reviews__score')).all()
-    pagination_class = PageNumberPagination
-    filter_backends = (DjangoFilterBackend,)
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre'
+    ).order_by('id')
+    pagination_class = TitlePagination
+    filter_backends = (DjangoFilterBackend, TitleOrderingFilter)
     filterset_class = TitleFilter
+    ordering_fields = ('rating', 'year', 'name', 'id')
     permission_classes = (IsAdminSuperUserOrReadOnly,)
 
     def get_serializer_class(self):
@@ -130,40 +162,335 @@ class TitleViewSet(viewsets.ModelViewSet):
             return TitleCreateSerializer
         return TitleListSerializer
 
+    @action(detail=True, url_path='rating-stats')
+    def rating_stats(self, request, pk=None):
+        """Количество, среднее и гистограмма оценок произведения."""
+        stats = rating_stats(pk)
+        if not stats['count'] and not Title.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(RatingStatsSerializer(stats).data)
+
+    @action(detail=False, permission_classes=(IsAdminOrSuperuser,))
+    def export(self, request):
+        """Потоковая выгрузка произведений (фильтры как у списка).
+
+        ?output=ndjson (по умолчанию) или csv, ?reviews=1 добавляет
+        отзывы.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORTERS:
+            raise ValidationError({'output': [
+                f'Допустимые значения: {", ".join(EXPORTERS)}.'
+            ]})
+        with_reviews = request.query_params.get('reviews') in ('1', 'true')
+        response = StreamingHttpResponse(
+            EXPORTERS[output](
+                self.filter_queryset(self.get_queryset()), with_reviews
+            ),
+            content_type=CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="titles.{output}"'
+        )
+        return response
+
+    @action(detail=False)
+    def top(self, request):
+        """Произведения с наибольшим рейтингом (фильтры как у списка)."""
+
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.get_serializer(
+                top_titles(queryset, settings.LEADERBOARD_SIZE), many=True
+            ).data
+
+        return Response(get_leaderboard(
+            'top', request, build, settings.LEADERBOARD_TOP_MAX_AGE
+        ))
+
+    @action(detail=False)
+    def trending(self, request):
+        """Произведения с наибольшим числом отзывов за скользящее окно."""
+
+        def build():
+            counts = trending_title_counts(settings.LEADERBOARD_SIZE)
+            titles = self.get_queryset().in_bulk(
+                [title_id for title_id, _ in counts]
+            )
+            return [
+                dict(self.get_serializer(titles[title_id]).data,
+                     recent_reviews=review_count)
+                for title_id, review_count in counts if title_id in titles
+            ]
+
+        return Response(get_leaderboard(
+            'trending', request, build, settings.LEADERBOARD_TRENDING_MAX_AGE
+        ))
+
 
 class CategoryViewSet(ListCreateDeleteViewSet):
     """Вьюсет для модели Category."""
-    queryset = Category.objects.all()
+    queryset = Category.objects.order_by('slug')
     serializer_class = CategorySerializer
 
 
 class GenreViewSet(ListCreateDeleteViewSet):
     """Вьюсет для модели Genre."""
-    queryset = Genre.objects.all()
+    queryset = Genre.objects.order_by('slug')
     serializer_class = GenreSerializer
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class NestedParentMixin:
+    """Разрешение родительских объектов вложенных маршрутов.
+
+    Объекты кешируются на экземпляре вьюсета, то есть на время одного
+    запроса: get_queryset, perform_create и сериализатор получают
+    один и тот же объект без повторных запросов к БД.
+    """
+
+    @cached_property
+    def title(self):
+        return get_object_or_404(Title, id=self.kwargs.get('title_id'))
+
+    @cached_property
+    def review(self):
+        return get_object_or_404(
+            Review,
+            id=self.kwargs.get('review_id'),
+            title_id=self.kwargs.get('title_id'),
+        )
+
+
+class ReviewViewSet(NestedParentMixin, SparseFieldsetMixin, ValuesListMixin,
+                    WriteThrottleMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = PubDatePagination
     permission_classes = (IsStaffAuthorOrReadOnly,)
+    throttle_classes = (IPRateThrottle, UserRateThrottle)
+    throttle_scope = 'reviews'
+    sparse_required_fields = ('pub_date',)
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        return title.reviews.all()
+        # Порядок страниц совпадает с курсорным режимом.
+        return self.title.reviews.select_related('author').order_by(
+            '-pub_date', '-id'
+        )
+
+    def get_pagination_count(self, queryset):
+        # Счётчик rating_count не учитывает отзывы, записанные в обход
+        # api (ORM, loaddata, админка), поэтому страница им не
+        # ограничивается.
+        return self.title.rating_count, False
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        # Повторный отзыв отсекает ограничение unique_author_review.
+        try:
+            with transaction.atomic():
+                review = serializer.save(author=self.request.user,
+                                         title=self.title)
+                review_created(review)
+        except IntegrityError:
+            raise ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Можно оставить только один отзыв'
+                ]}
+            )
 
+    def perform_update(self, serializer):
+        old_score = serializer.instance.score
+        with transaction.atomic():
+            review = serializer.save()
+            review_updated(review, old_score)
 
-class CommentViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            review_deleted(instance)
+            instance.delete()
+
+
+class CommentViewSet(NestedParentMixin, SparseFieldsetMixin,
+                     ValuesListMixin, WriteThrottleMixin,
+                     viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    pagination_class = PubDatePagination
     permission_classes = (IsStaffAuthorOrReadOnly,)
+    throttle_classes = (IPRateThrottle, UserRateThrottle)
+    throttle_scope = 'comments'
+    sparse_required_fields = ('pub_date',)
 
     def get_queryset(self):
-        review = get_object_or_404(Review, id=self.kwargs.get('review_id'))
-        return review.comments.all()
+        return self.review.comments.select_related('author').order_by(
+            '-pub_date', '-id'
+        )
+
+    def get_pagination_count(self, queryset):
+        # Как у отзывов: счётчик только выводится в count.
+        return self.review.comments_count, False
 
     def perform_create(self, serializer):
-        review = get_object_or_404(Review, id=self.kwargs.get('review_id'))
-        serializer.save(author=self.request.user, review=review)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user,
+                                      review=self.review)
+            comment_created(comment)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            comment_deleted(instance)
+            instance.delete()
+
+
+class BulkCreateView(APIView):
+    """Массовое создание объектов из массива в одной транзакции.
+
+    Подклассы задают item_serializer_class и методы resolve(items) —
+    разрешить связанные объекты всех элементов одним запросом и вернуть
+    ошибки по элементам — и create(items) — создать объекты и вернуть
+    данные ответа. При любой ошибке ничего не создаётся; нарушение
+    ограничения БД из-за параллельной записи возвращается как 400
+    с conflict_message.
+    """
+    permission_classes = (IsAdminOrSuperuser,)
+    item_serializer_class = None
+    conflict_message = 'Данные изменились во время запроса, повторите его.'
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Ожидается массив объектов.'
+            ]})
+        if len(request.data) > settings.BULK_MAX_ITEMS:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f'Не более {settings.BULK_MAX_ITEMS} объектов за запрос.'
+            ]})
+        serializer = self.item_serializer_class(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+        errors = self.resolve(items)
+        if any(errors):
+            raise ValidationError(errors)
+        # Проверки resolve и вставка не атомарны: параллельный запрос
+        # может успеть создать конфликтующую строку.
+        try:
+            with transaction.atomic():
+                data = self.create(items)
+        except IntegrityError:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                self.conflict_message
+            ]})
+        bump_catalog_version()
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class TitleBulkView(BulkCreateView):
+    """Массовое создание произведений."""
+    item_serializer_class = TitleBulkSerializer
+
+    def resolve(self, items):
+        genres = Genre.objects.in_bulk(
+            {slug for item in items for slug in item['genre']},
+            field_name='slug',
+        )
+        categories = Category.objects.in_bulk(
+            {item['category'] for item in items}, field_name='slug',
+        )
+        errors = []
+        for item in items:
+            item_errors = {}
+            unknown = [slug for slug in item['genre'] if slug not in genres]
+            if unknown:
+                item_errors['genre'] = [
+                    f'Жанр не найден: {slug}.' for slug in unknown
+                ]
+            if item['category'] not in categories:
+                item_errors['category'] = ['Категория не найдена.']
+            else:
+                item['category_id'] = categories[item['category']].id
+            item['genre_ids'] = {
+                genres[slug].id for slug in item['genre'] if slug in genres
+            }
+            errors.append(item_errors)
+        return errors
+
+    def create(self, items):
+        titles = [
+            Title(name=item['name'], year=item['year'],
+                  description=item['description'],
+                  category_id=item['category_id'])
+            for item in items
+        ]
+        Title.objects.bulk_create(titles)
+        if not connection.features.can_return_ids_from_bulk_insert:
+            # Без RETURNING id читаются отдельно: после вставки транзакция
+            # держит блокировку записи (SQLite), и последние id — наши.
+            ids = list(Title.objects.order_by('-id').values_list(
+                'id', flat=True
+            )[:len(titles)])
+            for title, title_id in zip(titles, reversed(ids)):
+                title.id = title_id
+        GenreTitle.objects.bulk_create(
+            GenreTitle(title_id_id=title.id, genre_id_id=genre_id)
+            for title, item in zip(titles, items)
+            for genre_id in item['genre_ids']
+        )
+        return [
+            {'id': title.id, 'name': item['name'], 'year': item['year'],
+             'description': item['description'], 'genre': item['genre'],
+             'category': item['category']}
+            for title, item in zip(titles, items)
+        ]
+
+
+class ReviewBulkView(BulkCreateView):
+    """Массовый импорт отзывов с сохранением дат публикации."""
+    item_serializer_class = ReviewBulkSerializer
+    conflict_message = 'Можно оставить только один отзыв'
+    columns = ('title_id', 'text', 'author_id', 'score', 'pub_date',
+               'comments_count')
+
+    def resolve(self, items):
+        title_ids = set(Title.objects.filter(
+            id__in={item['title'] for item in items}
+        ).values_list('id', flat=True))
+        authors = User.objects.in_bulk(
+            {item['author'] for item in items}, field_name='username',
+        )
+        existing = set(Review.objects.filter(
+            title_id__in=title_ids,
+            author_id__in=[author.id for author in authors.values()],
+        ).values_list('title_id', 'author_id'))
+        now = timezone.now()
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['title'] not in title_ids:
+                item_errors['title'] = ['Произведение не найдено.']
+            author = authors.get(item['author'])
+            if author is None:
+                item_errors['author'] = ['Пользователь не найден.']
+            elif (item['title'], author.id) in existing:
+                item_errors[api_settings.NON_FIELD_ERRORS_KEY] = [
+                    'Можно оставить только один отзыв'
+                ]
+            else:
+                existing.add((item['title'], author.id))
+                item['author_id'] = author.id
+            item.setdefault('pub_date', now)
+            errors.append(item_errors)
+        return errors
+
+    def create(self, items):
+        reviews = [
+            Review(title_id=item['title'], text=item['text'],
+                   author_id=item['author_id'], score=item['score'],
+                   pub_date=item['pub_date'])
+            for item in items
+        ]
+        # insert_rows, а не bulk_create: auto_now_add перезаписал бы даты.
+        # Весь массив уходит одним многострочным INSERT.
+        created = insert_rows(Review, self.columns, (
+            (review.title_id, review.text, review.author_id, review.score,
+             connection.ops.adapt_datetimefield_value(review.pub_date), 0)
+            for review in reviews
+        ))
+        reviews_created(reviews)
+        return {'created': created}
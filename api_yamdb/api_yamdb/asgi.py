@@ -1,7 +1,19 @@
+"""
+ASGI config for YaMDb project.
+
+Django 2.2 не содержит ASGI-обработчика, поэтому приложение строится
+поверх WSGI-обработчика (см. api.asgi). Запуск:
+gunicorn api_yamdb.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
 import os
 
-from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
-application = get_asgi_application()
+wsgi_application = get_wsgi_application()
+
+from api.asgi import AsyncReadApplication  # noqa: E402 (после setup)
+
+application = AsyncReadApplication(wsgi_application)
@@ -26,15 +26,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'django_filters',
     'users',
-    'api',
+    'api.apps.ApiConfig',
     'reviews',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,7 +79,56 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default="postgres"),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default="postgres"),
         'HOST': os.getenv('DB_HOST', default="db"),
-        'PORT': os.getenv('DB_PORT', default="5432")
+        'PORT': os.getenv('DB_PORT', default="5432"),
+        # Постоянные соединения: секунд жизни, 0 — закрывать после запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0)),
+    }
+}
+
+# Реплики для чтения (api.db_router): DB_REPLICA_HOSTS через запятую,
+# host или host:port; для SQLite — имена файлов БД. В тестах реплики
+# зеркалируют default.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias].update(HOST=host,
+                                PORT=port or DATABASES[alias]['PORT'])
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+# Проверять постоянное соединение перед повторным использованием.
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1'
+# Сколько клиент читает из default после записи и сколько секунд
+# недоступная реплика исключена из выбора.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=5))
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', default=30))
+REPLICA_CACHE_ALIAS = 'default'
+
+
+# Cache
+# По умолчанию — локальный кеш процесса (LRU с MAX_ENTRIES и TTL).
+# Для общего кеша между воркерами задайте CACHE_BACKEND и CACHE_LOCATION,
+# например django.core.cache.backends.memcached.MemcachedCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='yamdb'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', default=300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
     }
 }
 
@@ -128,16 +181,46 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Фоновая очередь писем (users.mail_queue)
+EMAIL_QUEUE_ASYNC = os.getenv('EMAIL_QUEUE_ASYNC', default='True') == 'True'
+EMAIL_QUEUE_WORKERS = int(os.getenv('EMAIL_QUEUE_WORKERS', default=2))
+EMAIL_QUEUE_BATCH_SIZE = 50
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+# Базовая задержка повтора в секундах, удваивается с каждой попыткой.
+EMAIL_QUEUE_BACKOFF = 30
+# Сколько секунд письмо в статусе sending считается занятым.
+EMAIL_QUEUE_LEASE = 600
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.AllowAny',),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Лимиты api.throttling: '<throttle_scope>.ip' и '<throttle_scope>.user'.
+    'DEFAULT_THROTTLE_RATES': {
+        'signup.ip': os.getenv('THROTTLE_SIGNUP_RATE', default='10/hour'),
+        'token.ip': os.getenv('THROTTLE_TOKEN_RATE', default='30/hour'),
+        'reviews.ip': '300/hour',
+        'reviews.user': '60/hour',
+        'comments.ip': '600/hour',
+        'comments.user': '120/hour',
+    },
+    # Прокси перед приложением (nginx): IP клиента из X-Forwarded-For.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
 
+# Счётчики лимитов (api.throttling): алиас общего кеша из CACHES
+# или None — счётчики в памяти процесса.
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS') or None
+THROTTLE_LOCAL_MAX_SIZE = 100000
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -149,4 +232,68 @@ MAX_EMAIL_LENGTH = 254
 MAX_ROLE_LENGTH = 50
 FROM_EMAIL = 'yamdb@ya.ru'
 
+# Кеш ответов каталога (titles, categories, genres)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', default=300))
+
+# Списки каталога без фильтров: от скольких строк в таблице вместо
+# COUNT(*) берётся оценка PostgreSQL (pg_class.reltuples).
+COUNT_ESTIMATE_MIN_ROWS = int(
+    os.getenv('COUNT_ESTIMATE_MIN_ROWS', default=100000)
+)
+
+# Максимум объектов в одном запросе массового создания.
+BULK_MAX_ITEMS = 1000
+
+# Произведений в одной пачке потоковой выгрузки (api.export).
+EXPORT_CHUNK_SIZE = 1000
+
+# Рейтинги лучших и популярных произведений (reviews.leaderboards).
+# *_MAX_AGE — допустимое устаревание рейтинга в секундах.
+LEADERBOARD_SIZE = 50
+LEADERBOARD_MIN_REVIEWS = int(os.getenv('LEADERBOARD_MIN_REVIEWS', default=1))
+LEADERBOARD_TOP_MAX_AGE = int(os.getenv('LEADERBOARD_TOP_MAX_AGE', default=60))
+LEADERBOARD_TRENDING_MAX_AGE = int(
+    os.getenv('LEADERBOARD_TRENDING_MAX_AGE', default=300)
+)
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', default=72))
+
+# Инструментирование запросов (api.middleware.RequestTimingMiddleware):
+# доля запросов с замерами и порог медленного запроса в мс.
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_TIMING_SAMPLE_RATE', default=0.05)
+)
+REQUEST_TIMING_SLOW_MS = int(os.getenv('REQUEST_TIMING_SLOW_MS', default=500))
+
+# ASGI-режим (api.asgi): потоков ORM на воркер, одновременно
+# обрабатываемых запросов и ожидающих в очереди (сверх неё — 503).
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=8))
+ASGI_MAX_CONCURRENCY = int(os.getenv('ASGI_MAX_CONCURRENCY', default=32))
+ASGI_MAX_QUEUE = int(os.getenv('ASGI_MAX_QUEUE', default=256))
+
+# Быстрый путь чтения: списки через values() (api.fastpath) и JSON
+# через orjson (api.renderers). Ответы совпадают побайтно.
+API_FAST_PATH = os.getenv('API_FAST_PATH', default='1') == '1'
+
+# Сжатие ответов (api.middleware.CompressionMiddleware): минимальный
+# размер обычного ответа и сброс буфера потока в байтах.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default=1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_STREAM_FLUSH_SIZE = 16384
+
+# Страницы списков: ?page_size= до MAX_PAGE_SIZE. Страницы от
+# JSON_STREAMING_MIN_ITEMS элементов отдаются потоком частями
+# по JSON_STREAMING_BATCH_SIZE элементов (api.renderers).
+MAX_PAGE_SIZE = 1000
+JSON_STREAMING_MIN_ITEMS = 100
+JSON_STREAMING_BATCH_SIZE = 50
+
+# Кеш пользователей для JWT-аутентификации (api.authentication).
+# USER_CACHE_ALIAS — алиас общего кеша из CACHES или None.
+USER_CACHE_ALIAS = os.getenv('USER_CACHE_ALIAS') or None
+USER_CACHE_LOCAL_TTL = 5
+USER_CACHE_SHARED_TTL = 300
+USER_CACHE_MAX_SIZE = 10000
+
 DATA_PATH = 'static/data/'
@@ -0,0 +1,99 @@
+"""
+Низкоуровневая массовая вставка строк для команд загрузки данных.
+
+Строки передаются кортежами уже подготовленных для БД значений,
+в обход создания объектов моделей и pre_save (auto_now_add не
+перезаписывает переданные даты). С ignore_conflicts строки, нарушающие
+ограничения уникальности, пропускаются одинаково для INSERT и COPY,
+а функции возвращают число действительно вставленных строк.
+"""
+
+import csv
+import io
+
+from django.core.management.color import no_style
+from django.db import connection
+
+
+def quoted_columns(columns):
+    return ', '.join(connection.ops.quote_name(column) for column in columns)
+
+
+def copy_rows(model, columns, rows, ignore_conflicts=False):
+    """Вставить строки через COPY FROM STDIN (PostgreSQL).
+
+    С ignore_conflicts строки копируются во временную таблицу и
+    переносятся из неё INSERT ... ON CONFLICT DO NOTHING.
+    """
+    rows = list(rows)
+    buffer = io.StringIO()
+    # QUOTE_NONNUMERIC: None пишется пустым полем (NULL), а пустая
+    # строка — как "" и остаётся пустой строкой.
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerows(rows)
+    buffer.seek(0)
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = quoted_columns(columns)
+    with connection.cursor() as cursor:
+        if not ignore_conflicts:
+            cursor.cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN WITH CSV', buffer
+            )
+            return len(rows)
+        staging = connection.ops.quote_name(
+            f'{model._meta.db_table}_staging'
+        )
+        # Таблица живёт до конца транзакции и переиспользуется пачками.
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} '
+                       f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP')
+        cursor.execute(f'TRUNCATE {staging}')
+        cursor.cursor.copy_expert(
+            f'COPY {staging} ({columns}) FROM STDIN WITH CSV', buffer
+        )
+        cursor.execute(f'INSERT INTO {table} ({columns}) '
+                       f'SELECT {columns} FROM {staging} '
+                       f'ON CONFLICT DO NOTHING')
+        return cursor.rowcount
+
+
+def insert_rows(model, columns, rows, use_copy=False,
+                ignore_conflicts=False):
+    """Вставить строки одним COPY или одним многострочным INSERT.
+
+    На SQLite число параметров запроса ограничено, поэтому строки
+    вставляются executemany в рамках одного вызова.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    if use_copy:
+        return copy_rows(model, columns, rows, ignore_conflicts)
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = '({})'.format(', '.join(['%s'] * len(columns)))
+    insert = connection.ops.insert_statement(
+        ignore_conflicts=ignore_conflicts
+    )
+    suffix = connection.ops.ignore_conflicts_suffix_sql(
+        ignore_conflicts=ignore_conflicts
+    )
+    sql = f'{insert} {table} ({quoted_columns(columns)}) VALUES {{}} {suffix}'
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(sql.format(placeholders), rows)
+        else:
+            # Один запрос на пачку вместо запроса на каждую строку.
+            cursor.execute(
+                sql.format(', '.join([placeholders] * len(rows))),
+                [value for row in rows for value in row],
+            )
+        if ignore_conflicts:
+            return cursor.rowcount
+    return len(rows)
+
+
+def reset_sequences(*models):
+    """Сдвинуть последовательности id после вставки явных id."""
+    sql_list = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in sql_list:
+            cursor.execute(sql)
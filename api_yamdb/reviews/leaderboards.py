@@ -0,0 +1,40 @@
+"""
+Рейтинги лучших и популярных произведений.
+
+Оба рейтинга читаются из структур, которые поддерживаются при записи
+отзывов (см. reviews.ratings): лучшие — из денормализованного рейтинга
+Title по индексу title_top_idx, популярные — из почасовых счётчиков
+TitleReviewBucket за скользящее окно. Запросов к Review с GROUP BY
+на чтении нет.
+"""
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import TitleReviewBucket
+from .ratings import trending_window_start
+
+TOP_ORDERING = ('-rating', '-rating_count', 'id')
+
+
+def top_titles(queryset, limit):
+    """Произведения queryset с наибольшим рейтингом."""
+    return queryset.filter(
+        rating_count__gte=settings.LEADERBOARD_MIN_REVIEWS,
+    ).order_by(*TOP_ORDERING)[:limit]
+
+
+def trending_title_counts(limit):
+    """Пары (id произведения, число отзывов) за скользящее окно.
+
+    Только чтение: устаревшие счётчики удаляет rebuild_trending.
+    """
+    return list(
+        TitleReviewBucket.objects.order_by()
+        .filter(hour__gte=trending_window_start())
+        .values('title_id')
+        .annotate(review_count=Sum('count'))
+        .filter(review_count__gt=0)
+        .order_by('-review_count', 'title_id')
+        .values_list('title_id', 'review_count')[:limit]
+    )
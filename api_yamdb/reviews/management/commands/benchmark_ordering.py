@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+
+from api.filters import order_titles
+from api.views import TitleViewSet
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from reviews.models import Title
+
+ORDERINGS = ('id', '-id', 'rating', '-rating', 'year', '-year', 'name',
+             '-name')
+# Признаки сортировки всей выборки в плане запроса.
+SORT_MARKERS = ('Sort', 'TEMP B-TREE', 'filesort')
+
+
+class RollbackError(Exception):
+    """Откат синтетических данных после замеров."""
+
+
+class Command(BaseCommand):
+    """Замеряет сортировки ?ordering= на синтетическом каталоге."""
+
+    help = ('Создаёт синтетический каталог произведений и замеряет первую '
+            'и дальнюю страницу для каждой сортировки TitleViewSet.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--deep-page', type=int, default=100,
+                            help='Номер дальней страницы.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--use-existing',
+            action='store_true',
+            help='Не создавать данные, использовать текущую БД.',
+        )
+
+    def generate(self, count, batch_size, rng):
+        """Вставляет count произведений, часть из них без оценок."""
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            titles = []
+            for _ in range(size):
+                rating_count = rng.choice((0, 0, rng.randint(1, 500)))
+                rating_sum = sum(
+                    rng.randint(1, 10) for _ in range(min(rating_count, 10))
+                ) * max(rating_count // 10, 1)
+                titles.append(Title(
+                    name=f'Произведение {rng.randrange(count)}',
+                    year=rng.randint(1900, 2022),
+                    description='',
+                    rating_sum=rating_sum if rating_count else 0,
+                    rating_count=rating_count,
+                    rating=(rating_sum // rating_count
+                            if rating_count else None),
+                ))
+            Title.objects.bulk_create(titles)
+            created += size
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE reviews_title')
+
+    def measure(self, queryset, repeat):
+        """Возвращает медиану времени выборки страницы, в мс."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, options):
+        size = options['page_size']
+        offset = (options['deep_page'] - 1) * size
+        for ordering in ORDERINGS:
+            queryset = order_titles(TitleViewSet.queryset, [ordering])
+            plan = queryset[:size].explain()
+            sorted_all = any(marker in plan for marker in SORT_MARKERS)
+            first = self.measure(queryset[:size], options['repeat'])
+            deep = self.measure(queryset[offset:offset + size],
+                                options['repeat'])
+            self.stdout.write(
+                f'{ordering:8} первая={first:7.1f} мс '
+                f'страница {options["deep_page"]}={deep:7.1f} мс '
+                f'{"СОРТИРОВКА" if sorted_all else "индекс"}'
+            )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                if not options['use_existing']:
+                    started = time.perf_counter()
+                    self.generate(options['titles'], options['batch_size'],
+                                  rng)
+                    self.stdout.write(
+                        f'Создано произведений: {options["titles"]} за '
+                        f'{time.perf_counter() - started:.1f} с '
+                        f'({connection.vendor}).'
+                    )
+                self.report(options)
+                raise RollbackError
+        except RollbackError:
+            self.stdout.write('Синтетические данные удалены.')
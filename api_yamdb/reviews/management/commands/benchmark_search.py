@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+
+from api.filters import TitleFilter
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from reviews.models import Title
+
+WORDS = (
+    'побег', 'шоушенк', 'крёстный', 'отец', 'звёздные', 'войны', 'матрица',
+    'властелин', 'колец', 'гарри', 'поттер', 'тёмный', 'рыцарь', 'начало',
+    'интерстеллар', 'бойцовский', 'клуб', 'зелёная', 'миля', 'форрест',
+    'гамп', 'король', 'лев', 'список', 'шиндлера', 'пианист', 'остров',
+    'проклятых', 'терминатор', 'чужой', 'бегущий', 'лезвию', 'бритвы',
+)
+
+
+class RollbackError(Exception):
+    """Откат синтетических данных после замеров."""
+
+
+class Command(BaseCommand):
+    """Замеряет поиск произведений на синтетическом каталоге."""
+
+    help = ('Создаёт синтетический каталог произведений и сравнивает '
+            'фильтр name (LIKE) с поиском search.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не удалять созданные произведения после замеров.',
+        )
+
+    def generate(self, count, batch_size, rng):
+        """Вставляет count произведений со случайными названиями."""
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            Title.objects.bulk_create(
+                Title(
+                    name=' '.join(rng.sample(WORDS, rng.randint(1, 4))),
+                    year=rng.randint(1900, 2022),
+                    description='',
+                )
+                for _ in range(size)
+            )
+            created += size
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE reviews_title')
+
+    def measure(self, params, repeat):
+        """Возвращает медиану времени первой страницы выдачи, в мс."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = TitleFilter(params, Title.objects.all()).qs
+            list(queryset[:10])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = ('побег', 'шоушенк', 'шоушенг', 'властелин колец', 'ера')
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                self.generate(options['titles'], options['batch_size'], rng)
+                self.stdout.write(
+                    f'Создано произведений: {options["titles"]} за '
+                    f'{time.perf_counter() - started:.1f} с '
+                    f'({connection.vendor}).'
+                )
+                for value in queries:
+                    like = self.measure({'name': value}, options['repeat'])
+                    search = self.measure(
+                        {'search': value}, options['repeat']
+                    )
+                    self.stdout.write(
+                        f'{value!r}: name={like:.1f} мс, '
+                        f'search={search:.1f} мс'
+                    )
+                if not options['keep']:
+                    raise RollbackError
+        except RollbackError:
+            self.stdout.write('Синтетические данные удалены.')
@@ -1,18 +1,35 @@
 import csv
 import os
+import time
+from itertools import islice
 
+from api.cache import bump_catalog_version
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db.utils import IntegrityError
-from django.shortcuts import get_object_or_404
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from reviews.bulk import insert_rows, reset_sequences
 from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from reviews.ratings import (rebuild_comment_counts, rebuild_histograms,
+                             rebuild_ratings, rebuild_review_buckets)
 from users.models import User
 
+DEFAULT_BATCH_SIZE = 5000
+
 
 class Command(BaseCommand):
-    """Класс менеджмент команд."""
+    """Класс менеджмент команд.
+
+    Файлы читаются потоково и записываются пачками через insert_rows
+    (многострочный INSERT или COPY на PostgreSQL), по одной транзакции
+    на файл. Даты из csv сохраняются как есть, строки, уже имеющиеся
+    в БД, пропускаются. Внешние ключи проверяются по заранее загруженным
+    множествам id, а не запросом на каждую строку.
+    """
+
+    help = 'Загружает данные из csv файлов в БД.'
 
-    # Словарь с названиями csv файлов и соответствующими им моделями.
+    # Словарь с названиями csv файлов и соответствующими им моделями,
+    # в порядке загрузки.
     csvfiles_models = {
         'category.csv': Category,
         'genre.csv': Genre,
@@ -23,122 +40,215 @@ class Command(BaseCommand):
         'comments.csv': Comment,
     }
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной пачке вставки.',
+        )
+        parser.add_argument(
+            '--truncate',
+            action='store_true',
+            help='Очистить таблицы перед загрузкой.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Пропускать строки с id не больше уже загруженного '
+                 'максимума (продолжение прерванной загрузки).',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Использовать COPY FROM STDIN (только PostgreSQL).',
+        )
+
     def get_data(self, csvfile):
-        """Забирает данные из csv файла и возвращает список словарей."""
+        """Построчно отдаёт данные из csv файла в виде словарей."""
         file_path = os.path.join(settings.BASE_DIR, settings.DATA_PATH,
                                  csvfile)
         with open(file_path, 'r', encoding='UTF-8') as file:
-            data = csv.DictReader(file)
-            return list(data)
-
-    def title_entries(self):
-        """Добавляет записи в модель Title."""
-        csv_file = 'titles.csv'
-        model = self.csvfiles_models[csv_file]
-        data = self.get_data(csv_file)
-        for entry in data:
-            id = entry['id']
-            name = entry['name']
-            year = entry['year']
-            category = get_object_or_404(Category,
-                                         pk=entry['category'])
-            model.objects.get_or_create(
-                id=id,
-                name=name,
-                year=year,
-                category=category
-            )
-        total_objects = model.objects.count()
-        self.terminal_message(csv_file, total_objects)
-
-    def genretitle_entries(self):
-        """Добавляет записи в модель GenreTitle."""
-        csv_file = 'genre_title.csv'
-        model = self.csvfiles_models[csv_file]
-        data = self.get_data(csv_file)
-        for entry in data:
-            id = entry['id']
-            title = get_object_or_404(Title, pk=entry['title_id'])
-            genre = get_object_or_404(Genre, pk=entry['genre_id'])
-            model.objects.get_or_create(
-                id=id,
-                title_id=title,
-                genre_id=genre
+            yield from csv.DictReader(file)
+
+    def id_map(self, model):
+        """Возвращает множество существующих id модели (с кешированием)."""
+        if model not in self.id_maps:
+            self.id_maps[model] = set(
+                model.objects.values_list('pk', flat=True).iterator()
             )
-        total_objects = model.objects.count()
-        self.terminal_message(csv_file, total_objects)
-
-    def review_entries(self):
-        """Добавляет записи в модель Review."""
-        csv_file = 'review.csv'
-        model = self.csvfiles_models[csv_file]
-        data = self.get_data(csv_file)
-        for entry in data:
-            id = entry['id']
-            title = get_object_or_404(Title, pk=entry['title_id'])
-            text = entry['text']
-            author = get_object_or_404(User, pk=entry['author'])
-            score = entry['score']
-            pub_date = entry['pub_date']
-            try:
-                model.objects.get_or_create(
-                    id=id,
-                    title=title,
-                    text=text,
-                    author=author,
-                    score=score,
-                    pub_date=pub_date
+        return self.id_maps[model]
+
+    def simple_entry(self, model, entry):
+        """Создаёт объект несложной модели (Category, Genre, User)."""
+        return model(**entry)
+
+    def title_entry(self, model, entry):
+        """Создаёт объект модели Title."""
+        if int(entry['category']) not in self.id_map(Category):
+            return None
+        return model(
+            id=entry['id'],
+            name=entry['name'],
+            year=entry['year'],
+            category_id=entry['category'],
+        )
+
+    def genretitle_entry(self, model, entry):
+        """Создаёт объект модели GenreTitle."""
+        if (int(entry['title_id']) not in self.id_map(Title)
+                or int(entry['genre_id']) not in self.id_map(Genre)):
+            return None
+        return model(
+            id=entry['id'],
+            title_id_id=entry['title_id'],
+            genre_id_id=entry['genre_id'],
+        )
+
+    def review_entry(self, model, entry):
+        """Создаёт объект модели Review."""
+        if (int(entry['title_id']) not in self.id_map(Title)
+                or int(entry['author']) not in self.id_map(User)):
+            return None
+        return model(
+            id=entry['id'],
+            title_id=entry['title_id'],
+            text=entry['text'],
+            author_id=entry['author'],
+            score=entry['score'],
+            pub_date=entry['pub_date'],
+        )
+
+    def comment_entry(self, model, entry):
+        """Создаёт объект модели Comment."""
+        if (int(entry['review_id']) not in self.id_map(Review)
+                or int(entry['author']) not in self.id_map(User)):
+            return None
+        return model(
+            id=entry['id'],
+            review_id=entry['review_id'],
+            text=entry['text'],
+            author_id=entry['author'],
+            pub_date=entry['pub_date'],
+        )
+
+    def get_builder(self, model):
+        """Возвращает функцию, превращающую строку csv в объект модели."""
+        builders = {
+            Title: self.title_entry,
+            GenreTitle: self.genretitle_entry,
+            Review: self.review_entry,
+            Comment: self.comment_entry,
+        }
+        return builders.get(model, self.simple_entry)
+
+    def truncate(self):
+        """Очищает таблицы всех загружаемых моделей."""
+        models = list(self.csvfiles_models.values())
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                tables = ', '.join(
+                    connection.ops.quote_name(model._meta.db_table)
+                    for model in models
                 )
-            except IntegrityError:
+                cursor.execute(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+            else:
+                for model in reversed(models):
+                    model.objects.all().delete()
+        self.stdout.write('Таблицы очищены.')
+
+    def objects(self, csvfile, model, min_id):
+        """Потоково строит объекты модели, пропуская некорректные строки."""
+        build = self.get_builder(model)
+        for entry in self.get_data(csvfile):
+            if int(entry['id']) <= min_id:
                 continue
-        total_objects = model.objects.count()
-        self.terminal_message(csv_file, total_objects)
-
-    def comments_entries(self):
-        """Добавляет записи в модель Comment."""
-        csv_file = 'comments.csv'
-        model = self.csvfiles_models[csv_file]
-        data = self.get_data(csv_file)
-        for entry in data:
-            id = entry['id']
-            review = get_object_or_404(Review, pk=entry['review_id'])
-            text = entry['text']
-            author = get_object_or_404(User, pk=entry['author'])
-            pub_date = entry['pub_date']
-            try:
-                model.objects.get_or_create(
-                    id=id,
-                    review=review,
-                    text=text,
-                    author=author,
-                    pub_date=pub_date,
-                )
-            except IntegrityError:
+            obj = build(model, entry)
+            if obj is None:
+                self.skipped += 1
                 continue
-        total_objects = model.objects.count()
-        self.terminal_message(csv_file, total_objects)
+            yield obj
+
+    def load_file(self, csvfile, model, options):
+        """Загружает один csv файл пачками в одной транзакции."""
+        min_id = 0
+        if options['resume']:
+            min_id = model.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            ).first() or 0
+        fields = model._meta.concrete_fields
+        columns = [field.column for field in fields]
+        batch_size = options['batch_size']
+        self.skipped = 0
+        loaded = existing = 0
+        started = time.monotonic()
+        objects = self.objects(csvfile, model, min_id)
+        with transaction.atomic():
+            while True:
+                batch = list(islice(objects, batch_size))
+                if not batch:
+                    break
+                inserted = insert_rows(
+                    model, columns, (self.row(obj, fields) for obj in batch),
+                    options['copy'], ignore_conflicts=True,
+                )
+                loaded += inserted
+                existing += len(batch) - inserted
+                self.progress_message(csvfile, loaded, started)
+            reset_sequences(model)
+        # Множество id модели устарело: перечитаем при следующем обращении.
+        self.id_maps.pop(model, None)
+        elapsed = time.monotonic() - started
+        self.terminal_message(csvfile, loaded, self.skipped, existing,
+                              elapsed)
+
+    @staticmethod
+    def row(obj, fields):
+        """Значения полей объекта для вставки.
+
+        pre_save вызывается только для пустых полей: auto_now_add
+        не должен перезаписывать дату из csv.
+        """
+        values = []
+        for field in fields:
+            value = getattr(obj, field.attname)
+            if value is None:
+                value = field.pre_save(obj, True)
+            values.append(field.get_db_prep_save(value, connection))
+        return values
 
-    def terminal_message(self, csvfile, total_objects):
+    def progress_message(self, csvfile, loaded, started):
+        """Выводит в терминал прогресс загрузки файла."""
+        elapsed = time.monotonic() - started
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(f'{csvfile}: загружено {loaded} строк '
+                          f'({rate:.0f} строк/с).')
+
+    def terminal_message(self, csvfile, loaded, skipped, existing,
+                         elapsed):
         """Выводит в терминал информационное сообщение."""
-        self.stdout.write(f'В модели файла {csvfile} записей: '
-                          f'{total_objects}.')
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(f'Из файла {csvfile} загружено строк: {loaded}, '
+                          f'пропущено: {skipped}, уже в БД: {existing}, '
+                          f'за {elapsed:.2f} с ({rate:.0f} строк/с).')
 
     def handle(self, *args, **options):
         """Заполняет модели БД записями из csv файлов."""
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL.')
+        if options['truncate']:
+            self.truncate()
+        self.id_maps = {}
         for csvfile, model in self.csvfiles_models.items():
-            # Обращение к несложным моделям.
-            if model in [Category, Genre, User]:
-                data = self.get_data(csvfile)
-                for entry in data:
-                    model.objects.get_or_create(**entry)
-                total_objects = model.objects.count()
-                self.terminal_message(csvfile, total_objects)
-
-        # Обращение к методам переноса данных в сложные модели.
-        self.title_entries()
-        self.genretitle_entries()
-        self.review_entries()
-        self.comments_entries()
+            self.load_file(csvfile, model, options)
+
+        # Отзывы и комментарии добавлены напрямую, поэтому рейтинг,
+        # гистограммы и счётчики пересчитываются целиком.
+        rebuild_ratings()
+        rebuild_histograms()
+        rebuild_review_buckets()
+        rebuild_comment_counts()
+        bump_catalog_version()
 
         # Заключительное сообщение об успешном переносе данных.
         self.stdout.write('Все данные успешно перенесены.')
@@ -0,0 +1,62 @@
+from api.filters import TitleFilter, order_titles
+from api.views import TitleViewSet
+from django.core.management.base import BaseCommand
+from reviews.models import Comment, Genre, GenreTitle, Review, Title
+
+
+class Command(BaseCommand):
+    """Выводит планы выполнения запросов эндпоинтов api."""
+
+    help = ('Печатает EXPLAIN для запросов вьюсетов api/views.py и '
+            'фильтров api/filters.py, чтобы регрессии индексов были видны.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE, только PostgreSQL).',
+        )
+
+    def get_queries(self):
+        """Возвращает пары (описание, queryset) для типичных запросов."""
+        title = Title.objects.order_by('id').first()
+        review = Review.objects.order_by('id').first()
+        genre = Genre.objects.order_by('id').first()
+        title_id = title.id if title else 0
+        review_id = review.id if review else 0
+        category_slug = (
+            title.category.slug if title and title.category else 'movie'
+        )
+        genre_slug = genre.slug if genre else 'drama'
+        titles = TitleViewSet.queryset
+        return (
+            ('titles list', titles.order_by('id')[:10]),
+            ('titles genre prefetch',
+             GenreTitle.objects.filter(title_id__in=[title_id])),
+            ('titles ?category=&year=',
+             TitleFilter({'category': category_slug, 'year': 2000},
+                         titles).qs[:10]),
+            ('titles ?genre=', TitleFilter({'genre': genre_slug},
+                                           titles).qs[:10]),
+            ('titles ?name=', TitleFilter({'name': 'по'}, titles).qs[:10]),
+            ('titles ?search=', TitleFilter({'search': 'побег'},
+                                            titles).qs[:10]),
+            ('titles ?ordering=-rating',
+             order_titles(titles, ['-rating'])[:10]),
+            ('titles ?ordering=year', order_titles(titles, ['year'])[:10]),
+            ('titles ?ordering=name', order_titles(titles, ['name'])[:10]),
+            ('reviews list',
+             Review.objects.filter(title_id=title_id)
+             .select_related('author').order_by('-pub_date', '-id')[:10]),
+            ('review detail',
+             Review.objects.filter(title_id=title_id, pk=review_id)),
+            ('comments list',
+             Comment.objects.filter(review_id=review_id)
+             .select_related('author').order_by('-pub_date', '-id')[:10]),
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, queryset in self.get_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}'))
+            self.stdout.write(queryset.explain(**explain_options))
@@ -0,0 +1,349 @@
+import bisect
+import multiprocessing
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from api.cache import bump_catalog_version
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from reviews.bulk import insert_rows, reset_sequences
+from reviews.models import Category, Comment, Genre, GenreTitle, Review, Title
+from reviews.ratings import (rebuild_histograms, rebuild_ratings,
+                             rebuild_review_buckets)
+from users.models import USER, User
+
+WORDS = (
+    'фильм', 'книга', 'сюжет', 'герой', 'финал', 'актёр', 'режиссёр',
+    'музыка', 'история', 'драма', 'любовь', 'война', 'мир', 'время',
+    'город', 'ночь', 'тайна', 'дорога', 'море', 'небо', 'звезда', 'тень',
+    'свет', 'сердце', 'память', 'судьба', 'песня', 'дом', 'лето', 'зима',
+    'отлично', 'скучно', 'неожиданно', 'смешно', 'грустно', 'красиво',
+)
+
+USER_COLUMNS = (
+    'id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+    'email', 'is_staff', 'is_active', 'date_joined', 'bio', 'role',
+)
+TITLE_COLUMNS = (
+    'id', 'name', 'year', 'description', 'category_id',
+    'rating_sum', 'rating_count',
+)
+GENRE_TITLE_COLUMNS = ('title_id_id', 'genre_id_id')
+REVIEW_COLUMNS = (
+    'id', 'title_id', 'text', 'author_id', 'score', 'pub_date',
+    'comments_count',
+)
+COMMENT_COLUMNS = ('review_id', 'text', 'author_id', 'pub_date')
+
+# Примерное число отзывов в одной задаче воркера.
+REVIEWS_PER_TASK = 100_000
+
+
+def zipf_cum_weights(size, exponent):
+    """Накопленные веса распределения Ципфа для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def zipf_pick(rng, cum_weights):
+    """Индекс по распределению Ципфа (0 — самый популярный)."""
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words)).capitalize()
+
+
+def task_rng(seed, phase, number):
+    """Детерминированный генератор для задачи, не зависящий от воркера."""
+    return random.Random(f'{seed}:{phase}:{number}')
+
+
+def adapt_datetime(value):
+    return connection.ops.adapt_datetimefield_value(value)
+
+
+def generate_titles(task):
+    """Задача воркера: пачка произведений и их жанров."""
+    rng = task_rng(task['seed'], 'titles', task['number'])
+    category_weights = zipf_cum_weights(len(task['category_ids']),
+                                        task['zipf'])
+    genre_weights = zipf_cum_weights(len(task['genre_ids']), task['zipf'])
+    titles = []
+    genre_titles = []
+    for title_id in range(task['first_id'], task['last_id'] + 1):
+        titles.append((
+            title_id,
+            sentence(rng, rng.randint(1, 4)),
+            rng.randint(1900, task['year']),
+            sentence(rng, rng.randint(5, 60)),
+            task['category_ids'][zipf_pick(rng, category_weights)],
+            0,
+            0,
+        ))
+        genres = {
+            task['genre_ids'][zipf_pick(rng, genre_weights)]
+            for _ in range(rng.randint(1, task['genres_per_title']))
+        }
+        genre_titles.extend((title_id, genre_id) for genre_id in genres)
+    with transaction.atomic():
+        insert_rows(Title, TITLE_COLUMNS, titles, task['copy'])
+        insert_rows(GenreTitle, GENRE_TITLE_COLUMNS, genre_titles,
+                    task['copy'])
+    connection.close()
+    return len(titles)
+
+
+def generate_reviews(task):
+    """Задача воркера: отзывы для набора произведений и комментарии к ним.
+
+    Авторы отзывов произведения — непрерывное окно id пользователей
+    со случайным сдвигом, поэтому пара (title, author) уникальна.
+    """
+    rng = task_rng(task['seed'], 'reviews', task['number'])
+    user_first = task['user_first']
+    user_count = task['user_last'] - user_first + 1
+    now = timezone.now()
+    span = task['days'] * 24 * 3600
+    review_id = task['first_review_id']
+    reviews = []
+    comments = []
+    for title_id, review_count in task['titles']:
+        offset = rng.randrange(user_count)
+        for number in range(review_count):
+            author_id = user_first + (offset + number) % user_count
+            pub_date = now - timedelta(seconds=rng.random() * span)
+            text = sentence(rng, rng.randint(3, 40))
+            score = rng.randint(1, 10)
+            # Тяжёлый хвост: большинство отзывов без комментариев.
+            expected = (task['comments_per_review']
+                        * (rng.paretovariate(task['pareto']) - 1))
+            comment_count = int(expected) + (
+                rng.random() < expected - int(expected)
+            )
+            reviews.append((
+                review_id, title_id, text, author_id, score,
+                adapt_datetime(pub_date), comment_count,
+            ))
+            for _ in range(comment_count):
+                comments.append((
+                    review_id, sentence(rng, rng.randint(2, 20)),
+                    user_first + rng.randrange(user_count),
+                    adapt_datetime(
+                        pub_date + timedelta(seconds=rng.random() * 86400)
+                    ),
+                ))
+            review_id += 1
+    with transaction.atomic():
+        count = insert_rows(Review, REVIEW_COLUMNS, reviews, task['copy'])
+        comment_total = insert_rows(Comment, COMMENT_COLUMNS, comments,
+                                    task['copy'])
+    connection.close()
+    return count, comment_total
+
+
+class Command(BaseCommand):
+    """Генерирует синтетические данные больших объёмов."""
+
+    help = ('Генерирует пользователей, категории, жанры, произведения, '
+            'отзывы и комментарии с распределением популярности Ципфа.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--genres', type=int, default=50)
+        parser.add_argument('--titles', type=int, default=100_000)
+        parser.add_argument('--genres-per-title', type=int, default=3)
+        parser.add_argument('--reviews', type=int, default=1_000_000)
+        parser.add_argument(
+            '--comments-per-review',
+            type=float,
+            default=0.5,
+            help='Среднее число комментариев на отзыв.',
+        )
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель распределения Ципфа.')
+        parser.add_argument('--days', type=int, default=3650,
+                            help='Глубина дат публикации в днях.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10_000,
+                            help='Произведений в одной задаче.')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Вставлять через COPY (только PostgreSQL).',
+        )
+
+    def next_id(self, model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def create_users(self, options):
+        """Создаёт пользователей, возвращает диапазон их id."""
+        first_id = self.next_id(User)
+        now = adapt_datetime(timezone.now())
+        rows = (
+            (user_id, '!', False, f'gen_user{user_id}', None, None,
+             f'gen_user{user_id}@yamdb.fake', False, True, now, None, USER)
+            for user_id in range(first_id, first_id + options['users'])
+        )
+        with transaction.atomic():
+            insert_rows(User, USER_COLUMNS, rows, options['copy'])
+        return first_id, first_id + options['users'] - 1
+
+    def create_catalog(self, options):
+        """Создаёт категории и жанры, возвращает их id."""
+        first_category = self.next_id(Category)
+        Category.objects.bulk_create(
+            Category(name=f'Категория {number}',
+                     slug=f'gen-category-{number}')
+            for number in range(first_category,
+                                first_category + options['categories'])
+        )
+        first_genre = self.next_id(Genre)
+        Genre.objects.bulk_create(
+            Genre(name=f'Жанр {number}', slug=f'gen-genre-{number}')
+            for number in range(first_genre, first_genre + options['genres'])
+        )
+        category_ids = list(Category.objects.filter(
+            slug__startswith='gen-category-', id__gte=first_category,
+        ).order_by('id').values_list('id', flat=True))
+        genre_ids = list(Genre.objects.filter(
+            slug__startswith='gen-genre-', id__gte=first_genre,
+        ).order_by('id').values_list('id', flat=True))
+        return category_ids, genre_ids
+
+    def review_counts(self, options, title_ids, user_count):
+        """Распределяет отзывы по произведениям по закону Ципфа.
+
+        Произведение получает не больше user_count отзывов; излишек
+        переходит к менее популярным, поэтому сумма равна --reviews.
+        """
+        rng = task_rng(options['seed'], 'popularity', 0)
+        ranked = list(title_ids)
+        rng.shuffle(ranked)
+        weights = [1 / rank ** options['zipf']
+                   for rank in range(1, len(ranked) + 1)]
+        # Суммы весов произведения и всех менее популярных.
+        remaining_weights = list(accumulate(reversed(weights)))[::-1]
+        remaining = options['reviews']
+        counts = {}
+        for title_id, weight, remaining_weight in zip(
+            ranked, weights, remaining_weights
+        ):
+            counts[title_id] = min(
+                user_count,
+                int(round(remaining * weight / remaining_weight)),
+            )
+            remaining -= counts[title_id]
+        return counts
+
+    def run_tasks(self, function, tasks, processes, label):
+        """Выполняет задачи в пуле процессов и печатает прогресс."""
+        started = time.monotonic()
+        done = 0
+        # Соединения нельзя наследовать через fork.
+        connections.close_all()
+        if processes > 1:
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                for result in pool.imap_unordered(function, tasks):
+                    done += result[0] if isinstance(result, tuple) else result
+                    self.progress(label, done, started)
+        else:
+            for task in tasks:
+                result = function(task)
+                done += result[0] if isinstance(result, tuple) else result
+                self.progress(label, done, started)
+        return done
+
+    def progress(self, label, done, started):
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(f'{label}: {done} ({rate:.0f} строк/с)')
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL.')
+        if options['processes'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite не поддерживает параллельную запись.')
+        if options['reviews'] > options['titles'] * options['users']:
+            raise CommandError(
+                f'Не больше {options["titles"] * options["users"]} отзывов: '
+                f'у пользователя один отзыв на произведение.'
+            )
+        started = time.monotonic()
+        common = {
+            'seed': options['seed'],
+            'copy': options['copy'],
+            'zipf': options['zipf'],
+        }
+
+        user_first, user_last = self.create_users(options)
+        category_ids, genre_ids = self.create_catalog(options)
+        self.stdout.write(f'Пользователей: {options["users"]}, категорий: '
+                          f'{len(category_ids)}, жанров: {len(genre_ids)}.')
+
+        first_title = self.next_id(Title)
+        last_title = first_title + options['titles'] - 1
+        batch = options['batch_size']
+        title_tasks = [
+            dict(common, number=number, first_id=start,
+                 last_id=min(start + batch - 1, last_title),
+                 category_ids=category_ids, genre_ids=genre_ids,
+                 genres_per_title=options['genres_per_title'],
+                 year=timezone.now().year)
+            for number, start in enumerate(
+                range(first_title, last_title + 1, batch)
+            )
+        ]
+        self.run_tasks(generate_titles, title_tasks, options['processes'],
+                       'Произведения')
+
+        counts = self.review_counts(
+            options, range(first_title, last_title + 1),
+            user_last - user_first + 1,
+        )
+        review_tasks = []
+        review_id = self.next_id(Review)
+        current = []
+        current_size = 0
+        first_review_id = review_id
+        for title_id in range(first_title, last_title + 1):
+            if not counts[title_id]:
+                continue
+            current.append((title_id, counts[title_id]))
+            current_size += counts[title_id]
+            if current_size >= REVIEWS_PER_TASK:
+                review_tasks.append((current, first_review_id))
+                first_review_id += current_size
+                current, current_size = [], 0
+        if current:
+            review_tasks.append((current, first_review_id))
+        review_tasks = [
+            dict(common, number=number, titles=titles,
+                 first_review_id=first_id, user_first=user_first,
+                 user_last=user_last, days=options['days'],
+                 comments_per_review=options['comments_per_review'],
+                 # Среднее (alpha / (alpha - 1) - 1) равно 1 при alpha = 2.
+                 pareto=2.0)
+            for number, (titles, first_id) in enumerate(review_tasks)
+        ]
+        self.run_tasks(generate_reviews, review_tasks,
+                       options['processes'], 'Отзывы')
+
+        reset_sequences(User, Title, Review)
+        with transaction.atomic():
+            rebuild_ratings()
+            rebuild_histograms()
+            rebuild_review_buckets()
+        bump_catalog_version()
+        self.stdout.write(
+            f'Готово за {time.monotonic() - started:.1f} с: '
+            f'отзывов {Review.objects.count()}, '
+            f'комментариев {Comment.objects.count()}.'
+        )
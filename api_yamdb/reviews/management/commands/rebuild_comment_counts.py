@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.ratings import rebuild_comment_counts
+
+
+class Command(BaseCommand):
+    """Пересчитывает количество комментариев отзывов."""
+
+    help = ('Пересчитывает Review.comments_count одним UPDATE '
+            'с подзапросом по комментариям.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuild_comment_counts()
+        self.stdout.write(f'Счётчики комментариев пересчитаны, '
+                          f'отзывов: {updated}.')
@@ -0,0 +1,25 @@
+from api.cache import bump_catalog_version
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.ratings import REBUILD_BATCH_SIZE, rebuild_histograms
+
+
+class Command(BaseCommand):
+    """Пересчитывает гистограммы оценок произведений."""
+
+    help = ('Пересчитывает TitleScoreCount одним группирующим запросом '
+            'по отзывам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help='Количество строк гистограмм в одном bulk_create.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_histograms(batch_size=options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write(f'Гистограммы пересчитаны, строк: {created}.')
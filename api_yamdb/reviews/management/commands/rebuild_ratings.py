@@ -0,0 +1,25 @@
+from api.cache import bump_catalog_version
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.ratings import REBUILD_BATCH_SIZE, rebuild_ratings
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованный рейтинг произведений."""
+
+    help = 'Пересчитывает rating_sum, rating_count и rating у Title.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help='Количество произведений в одном bulk_update.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuild_ratings(batch_size=options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write(f'Рейтинг пересчитан, произведений с отзывами: '
+                          f'{updated}.')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews.ratings import (REBUILD_BATCH_SIZE, prune_review_buckets,
+                             rebuild_review_buckets)
+
+
+class Command(BaseCommand):
+    """Пересчитывает почасовые счётчики отзывов для популярных."""
+
+    help = ('Пересчитывает TitleReviewBucket за окно TRENDING_WINDOW_HOURS '
+            'одним группирующим запросом и удаляет устаревшие счётчики.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help='Количество строк счётчиков в одном bulk_create.',
+        )
+        parser.add_argument(
+            '--prune-only',
+            action='store_true',
+            help='Только удалить счётчики, вышедшие за окно '
+                 '(для запуска по расписанию).',
+        )
+
+    def handle(self, *args, **options):
+        if options['prune_only']:
+            deleted = prune_review_buckets()
+            self.stdout.write(f'Удалено устаревших счётчиков: {deleted}.')
+            return
+        with transaction.atomic():
+            created = rebuild_review_buckets(
+                batch_size=options['batch_size']
+            )
+        self.stdout.write(f'Счётчики отзывов пересчитаны, строк: {created}.')
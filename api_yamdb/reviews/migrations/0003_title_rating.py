@@ -0,0 +1,79 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import reviews.validators
+
+
+def fill_ratings(apps, schema_editor):
+    """Заполнить денормализованный рейтинг по существующим отзывам."""
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    totals = (
+        Review.objects.order_by()
+        .values('title_id')
+        .annotate(score_sum=models.Sum('score'),
+                  score_count=models.Count('id'))
+    )
+    for row in totals:
+        Title.objects.filter(pk=row['title_id']).update(
+            rating_sum=row['score_sum'],
+            rating_count=row['score_count'],
+            rating=row['score_sum'] // row['score_count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_auto_20221130_1519'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name': 'категория', 'verbose_name_plural': 'категории'},
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'verbose_name': 'комментарий', 'verbose_name_plural': 'комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='genre',
+            options={'verbose_name': 'жанр', 'verbose_name_plural': 'жанры'},
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'verbose_name': 'отзыв', 'verbose_name_plural': 'отзывы'},
+        ),
+        migrations.AlterModelOptions(
+            name='title',
+            options={'verbose_name': 'произведение', 'verbose_name_plural': 'произведения'},
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='reviews.Title', verbose_name='произведение'),
+        ),
+        migrations.AlterField(
+            model_name='title',
+            name='year',
+            field=models.IntegerField(blank=True, validators=[reviews.validators.validate_year]),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
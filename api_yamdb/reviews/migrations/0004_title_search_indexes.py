@@ -0,0 +1,44 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Выражения должны совпадать с SQL, который Django строит для
+# SearchVector('name', config='simple') и для lookup icontains,
+# иначе планировщик не использует индексы.
+CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS reviews_title_name_tsv_gin "
+    "ON reviews_title USING gin "
+    "(to_tsvector('simple'::regconfig, COALESCE(name, '')))",
+    "CREATE INDEX IF NOT EXISTS reviews_title_name_trgm_gin "
+    "ON reviews_title USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS reviews_title_name_upper_trgm_gin "
+    "ON reviews_title USING gin (UPPER(name::text) gin_trgm_ops)",
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS reviews_title_name_tsv_gin',
+    'DROP INDEX IF EXISTS reviews_title_name_trgm_gin',
+    'DROP INDEX IF EXISTS reviews_title_name_upper_trgm_gin',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_title_rating'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
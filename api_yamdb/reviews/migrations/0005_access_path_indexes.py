@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+def remove_duplicate_genre_titles(apps, schema_editor):
+    """Удалить повторные связи произведения с жанром перед UNIQUE."""
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    keep = (
+        GenreTitle.objects.order_by()
+        .values('title_id', 'genre_id')
+        .annotate(keep_id=models.Min('id'))
+        .values('keep_id')
+    )
+    GenreTitle.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'pub_date', 'id'], name='comment_review_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['title', 'pub_date', 'id'], name='review_title_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', 'year'], name='title_category_year_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_genre_titles,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='genretitle',
+            constraint=models.UniqueConstraint(fields=('title_id', 'genre_id'), name='unique_genre_title'),
+        ),
+    ]
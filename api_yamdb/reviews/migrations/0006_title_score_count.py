@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:31
+
+from itertools import islice
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Пачка строк бэкфилла: bulk_create без batch_size материализует
+# весь генератор, а явный batch_size в Django 2.2 не ограничивается
+# лимитом бэкенда (SQLite: too many terms in compound SELECT).
+BATCH_SIZE = 1000
+
+
+def fill_score_counts(apps, schema_editor):
+    """Заполнить гистограммы оценок по существующим отзывам."""
+    Review = apps.get_model('reviews', 'Review')
+    TitleScoreCount = apps.get_model('reviews', 'TitleScoreCount')
+    totals = (
+        Review.objects.order_by()
+        .values('title_id', 'score')
+        .annotate(score_count=models.Count('id'))
+    )
+    rows = (TitleScoreCount(title_id=row['title_id'], score=row['score'],
+                            count=row['score_count'])
+            for row in totals.iterator())
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        TitleScoreCount.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleScoreCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField(verbose_name='Оценка')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_counts', to='reviews.Title', verbose_name='произведение')),
+            ],
+            options={
+                'verbose_name': 'количество оценок',
+                'verbose_name_plural': 'количества оценок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='titlescorecount',
+            constraint=models.UniqueConstraint(fields=('title', 'score'), name='unique_title_score'),
+        ),
+        migrations.RunPython(fill_score_counts, migrations.RunPython.noop),
+    ]
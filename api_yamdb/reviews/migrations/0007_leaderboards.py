@@ -0,0 +1,81 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:33
+
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+import django.db.models.deletion
+
+# Пачка строк бэкфилла, как в 0006_title_score_count.
+BATCH_SIZE = 1000
+
+
+def fill_review_buckets(apps, schema_editor):
+    """Заполнить почасовые счётчики отзывов за скользящее окно."""
+    Review = apps.get_model('reviews', 'Review')
+    TitleReviewBucket = apps.get_model('reviews', 'TitleReviewBucket')
+    window_start = (timezone.now()
+                    - timedelta(hours=settings.TRENDING_WINDOW_HOURS))
+    totals = (
+        Review.objects.order_by()
+        .filter(pub_date__gte=window_start)
+        .annotate(hour=TruncHour('pub_date', tzinfo=timezone.utc))
+        .values('title_id', 'hour')
+        .annotate(review_count=models.Count('id'))
+    )
+    rows = (TitleReviewBucket(title_id=row['title_id'], hour=row['hour'],
+                              count=row['review_count'])
+            for row in totals.iterator())
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        TitleReviewBucket.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_title_score_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleReviewBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')),
+            ],
+            options={
+                'verbose_name': 'отзывы за час',
+                'verbose_name_plural': 'отзывы за час',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-rating', '-rating_count', 'id'], name='title_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['category', '-rating', '-rating_count', 'id'], name='title_category_top_idx'),
+        ),
+        migrations.AddField(
+            model_name='titlereviewbucket',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_buckets', to='reviews.Title', verbose_name='произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='titlereviewbucket',
+            index=models.Index(fields=['hour', 'title', 'count'], name='review_bucket_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='titlereviewbucket',
+            constraint=models.UniqueConstraint(fields=('title', 'hour'), name='unique_title_hour'),
+        ),
+        migrations.RunPython(fill_review_buckets,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+# На PostgreSQL NULL больше любого числа, а сортировка по рейтингу
+# считает произведения без оценок худшими (api.filters). Индекс
+# пересоздаётся так, чтобы обслуживать оба направления сортировки.
+RATING_NULLS_FIRST = (
+    'DROP INDEX IF EXISTS title_rating_idx',
+    'CREATE INDEX title_rating_idx ON reviews_title '
+    '(rating NULLS FIRST, id)',
+)
+RATING_DEFAULT = (
+    'DROP INDEX IF EXISTS title_rating_idx',
+    'CREATE INDEX title_rating_idx ON reviews_title (rating, id)',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['rating', 'id'], name='title_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['year', 'id'], name='title_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['name', 'id'], name='title_name_idx'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(RATING_NULLS_FIRST),
+            run_on_postgresql(RATING_DEFAULT),
+        ),
+    ]
@@ -36,8 +36,28 @@ class Title(models.Model):
                                    related_name='titles')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL,
                                  null=True, related_name='titles')
+    # Денормализованный рейтинг: сумма и количество оценок поддерживаются
+    # при записи отзывов (см. reviews.ratings), rating = сумма // количество.
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating = models.IntegerField(null=True, blank=True)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['category', 'year'],
+                         name='title_category_year_idx'),
+            # Сортировки ?ordering= (api.filters.TitleOrderingFilter).
+            # На PostgreSQL title_rating_idx пересоздаётся в миграции 0008
+            # как (rating NULLS FIRST, id).
+            models.Index(fields=['rating', 'id'], name='title_rating_idx'),
+            models.Index(fields=['year', 'id'], name='title_year_idx'),
+            models.Index(fields=['name', 'id'], name='title_name_idx'),
+            # Рейтинг лучших произведений (reviews.leaderboards).
+            models.Index(fields=['-rating', '-rating_count', 'id'],
+                         name='title_top_idx'),
+            models.Index(fields=['category', '-rating', '-rating_count', 'id'],
+                         name='title_category_top_idx'),
+        ]
         verbose_name = 'произведение'
         verbose_name_plural = 'произведения'
 
@@ -47,6 +67,14 @@ class GenreTitle(models.Model):
     title_id = models.ForeignKey(Title, on_delete=models.CASCADE)
     genre_id = models.ForeignKey(Genre, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title_id', 'genre_id'],
+                name='unique_genre_title'
+            )
+        ]
+
 
 class Review(models.Model):
     title = models.ForeignKey(
@@ -73,6 +101,10 @@ class Review(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    # Поддерживается при записи комментариев (см. reviews.ratings).
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0
+    )
 
     class Meta:
         constraints = [
@@ -81,10 +113,70 @@ class Review(models.Model):
                 name='unique_author_review'
             )
         ]
+        indexes = [
+            models.Index(fields=['title', 'pub_date', 'id'],
+                         name='review_title_pub_date_idx'),
+        ]
         verbose_name = 'отзыв'
         verbose_name_plural = 'отзывы'
 
 
+class TitleScoreCount(models.Model):
+    """Класс модели TitleScoreCount: гистограмма оценок произведения.
+
+    Количество отзывов с каждой оценкой поддерживается при записи
+    отзывов (см. reviews.ratings).
+    """
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='score_counts',
+        verbose_name='произведение'
+    )
+    score = models.PositiveSmallIntegerField('Оценка')
+    count = models.PositiveIntegerField('Количество отзывов', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'score'],
+                name='unique_title_score'
+            )
+        ]
+        verbose_name = 'количество оценок'
+        verbose_name_plural = 'количества оценок'
+
+
+class TitleReviewBucket(models.Model):
+    """Класс модели TitleReviewBucket: число новых отзывов за час.
+
+    Поддерживается при записи отзывов (см. reviews.ratings) и служит
+    для расчёта популярных за скользящее окно произведений.
+    """
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='review_buckets',
+        verbose_name='произведение'
+    )
+    hour = models.DateTimeField('Час')
+    count = models.PositiveIntegerField('Количество отзывов', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'hour'],
+                name='unique_title_hour'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'title', 'count'],
+                         name='review_bucket_hour_idx'),
+        ]
+        verbose_name = 'отзывы за час'
+        verbose_name_plural = 'отзывы за час'
+
+
 class Comment(models.Model):
     review = models.ForeignKey(
         Review,
@@ -105,5 +197,9 @@ class Comment(models.Model):
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['review', 'pub_date', 'id'],
+                         name='comment_review_pub_date_idx'),
+        ]
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
@@ -0,0 +1,349 @@
+"""
+Поддержка денормализованного рейтинга произведений.
+
+Сумма и количество оценок хранятся в модели Title и меняются
+одним UPDATE с F-выражениями, поэтому список произведений
+не обращается к таблице отзывов. Так же поддерживаются гистограмма
+оценок каждого произведения (TitleScoreCount), число новых отзывов
+по часам (TitleReviewBucket) для популярных произведений и количество
+комментариев отзыва (Review.comments_count). Количество отзывов
+произведения — это rating_count.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, NullIf, TruncHour
+from django.utils import timezone
+
+from .models import Comment, Review, Title, TitleReviewBucket, TitleScoreCount
+
+REBUILD_BATCH_SIZE = 1000
+SCORES = range(1, 11)
+
+
+def apply_score_delta(title_id, score_delta, count_delta):
+    """Атомарно изменить сумму и количество оценок произведения."""
+    new_sum = F('rating_sum') + score_delta
+    new_count = F('rating_count') + count_delta
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating=new_sum / NullIf(new_count, 0),
+    )
+
+
+def can_upsert():
+    """INSERT ... ON CONFLICT DO UPDATE: PostgreSQL и SQLite 3.24+."""
+    if connection.vendor == 'postgresql':
+        return True
+    return (connection.vendor == 'sqlite'
+            and connection.Database.sqlite_version_info >= (3, 24))
+
+
+def upsert_count(model, count_delta, lookup):
+    """Увеличить count строки model одним запросом, создав её при нужде.
+
+    Поля lookup должны составлять ограничение уникальности модели.
+    """
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in lookup]
+    columns = ', '.join(quote(field.column) for field in fields)
+    table = quote(model._meta.db_table)
+    count = quote('count')
+    placeholders = ', '.join(['%s'] * (len(fields) + 1))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}, {count}) '
+            f'VALUES ({placeholders}) ON CONFLICT ({columns}) '
+            f'DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}',
+            [field.get_db_prep_save(value, connection)
+             for field, value in zip(fields, lookup.values())]
+            + [count_delta],
+        )
+
+
+def apply_count_delta(model, count_delta, **lookup):
+    """Атомарно изменить поле count строки model, создав её при нужде."""
+    if count_delta > 0 and can_upsert():
+        upsert_count(model, count_delta, lookup)
+        return
+    rows = model.objects.filter(**lookup)
+    if rows.update(count=F('count') + count_delta) or count_delta < 0:
+        return
+    # Строки ещё нет: при гонке создания повторяем UPDATE.
+    try:
+        with transaction.atomic():
+            model.objects.create(count=count_delta, **lookup)
+    except IntegrityError:
+        rows.update(count=F('count') + count_delta)
+
+
+def apply_histogram_delta(title_id, score, count_delta):
+    """Атомарно изменить количество отзывов с оценкой score."""
+    apply_count_delta(TitleScoreCount, count_delta,
+                      title_id=title_id, score=score)
+
+
+def review_hour(pub_date):
+    """Начало часа публикации отзыва в UTC."""
+    return pub_date.astimezone(timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+def apply_bucket_delta(title_id, pub_date, count_delta):
+    """Атомарно изменить число отзывов произведения за час pub_date."""
+    apply_count_delta(TitleReviewBucket, count_delta,
+                      title_id=title_id, hour=review_hour(pub_date))
+
+
+def review_created(review):
+    """Учесть в рейтинге новый отзыв."""
+    apply_score_delta(review.title_id, review.score, 1)
+    apply_histogram_delta(review.title_id, review.score, 1)
+    apply_bucket_delta(review.title_id, review.pub_date, 1)
+
+
+def reviews_created(reviews):
+    """Учесть в рейтинге набор отзывов, вставленных в обход save()."""
+    score_sums = Counter()
+    score_counts = Counter()
+    histogram = Counter()
+    buckets = Counter()
+    window_start = trending_window_start()
+    for review in reviews:
+        score_sums[review.title_id] += review.score
+        score_counts[review.title_id] += 1
+        histogram[review.title_id, review.score] += 1
+        if review.pub_date >= window_start:
+            buckets[review.title_id, review_hour(review.pub_date)] += 1
+    for title_id, count in score_counts.items():
+        apply_score_delta(title_id, score_sums[title_id], count)
+    for (title_id, score), count in histogram.items():
+        apply_histogram_delta(title_id, score, count)
+    for (title_id, hour), count in buckets.items():
+        apply_count_delta(TitleReviewBucket, count,
+                          title_id=title_id, hour=hour)
+
+
+def review_updated(review, old_score):
+    """Учесть в рейтинге изменение оценки отзыва."""
+    if review.score != old_score:
+        apply_score_delta(review.title_id, review.score - old_score, 0)
+        apply_histogram_delta(review.title_id, old_score, -1)
+        apply_histogram_delta(review.title_id, review.score, 1)
+
+
+def review_deleted(review):
+    """Убрать из рейтинга удаляемый отзыв."""
+    apply_score_delta(review.title_id, -review.score, -1)
+    apply_histogram_delta(review.title_id, review.score, -1)
+    apply_bucket_delta(review.title_id, review.pub_date, -1)
+
+
+def reviews_deleted(reviews):
+    """Убрать из рейтинга набор отзывов (например, при удалении автора)."""
+    totals = (
+        reviews.order_by()
+        .values('title_id')
+        .annotate(score_sum=Sum('score'), score_count=Count('id'))
+    )
+    for row in totals:
+        apply_score_delta(
+            row['title_id'], -row['score_sum'], -row['score_count']
+        )
+    histogram = (
+        reviews.order_by()
+        .values('title_id', 'score')
+        .annotate(score_count=Count('id'))
+    )
+    for row in histogram:
+        apply_histogram_delta(
+            row['title_id'], row['score'], -row['score_count']
+        )
+    buckets = (
+        reviews.order_by()
+        .filter(pub_date__gte=trending_window_start())
+        .annotate(hour=TruncHour('pub_date', tzinfo=timezone.utc))
+        .values('title_id', 'hour')
+        .annotate(review_count=Count('id'))
+    )
+    for row in buckets:
+        apply_count_delta(TitleReviewBucket, -row['review_count'],
+                          title_id=row['title_id'], hour=row['hour'])
+
+
+def apply_comment_delta(review_id, count_delta):
+    """Атомарно изменить количество комментариев отзыва."""
+    Review.objects.filter(pk=review_id).update(
+        comments_count=F('comments_count') + count_delta
+    )
+
+
+def comment_created(comment):
+    """Учесть новый комментарий в счётчике отзыва."""
+    apply_comment_delta(comment.review_id, 1)
+
+
+def comment_deleted(comment):
+    """Убрать удаляемый комментарий из счётчика отзыва."""
+    apply_comment_delta(comment.review_id, -1)
+
+
+def comments_deleted(comments):
+    """Убрать из счётчиков набор комментариев (например, автора)."""
+    totals = (
+        comments.order_by()
+        .values('review_id')
+        .annotate(comment_count=Count('id'))
+    )
+    for row in totals:
+        apply_comment_delta(row['review_id'], -row['comment_count'])
+
+
+def rating_stats(title_id):
+    """Количество, среднее и гистограмма оценок произведения."""
+    histogram = dict.fromkeys(SCORES, 0)
+    histogram.update(
+        TitleScoreCount.objects.filter(title_id=title_id)
+        .values_list('score', 'count')
+    )
+    count = sum(histogram.values())
+    total = sum(score * number for score, number in histogram.items())
+    return {
+        'count': count,
+        'mean': round(total / count, 2) if count else None,
+        'histogram': histogram,
+    }
+
+
+def rebuild_ratings(batch_size=REBUILD_BATCH_SIZE):
+    """Пересчитать рейтинг всех произведений одним агрегирующим запросом.
+
+    Возвращает количество произведений, у которых есть отзывы.
+    """
+    Title.objects.update(rating_sum=0, rating_count=0, rating=None)
+    totals = (
+        Review.objects.order_by()
+        .values('title_id')
+        .annotate(score_sum=Sum('score'), score_count=Count('id'))
+    )
+    batch = []
+    updated = 0
+    for row in totals.iterator():
+        batch.append(Title(
+            pk=row['title_id'],
+            rating_sum=row['score_sum'],
+            rating_count=row['score_count'],
+            rating=row['score_sum'] // row['score_count'],
+        ))
+        if len(batch) >= batch_size:
+            _flush(batch)
+            updated += batch_size
+            batch = []
+    if batch:
+        _flush(batch)
+        updated += len(batch)
+    return updated
+
+
+def rebuild_histograms(batch_size=REBUILD_BATCH_SIZE):
+    """Пересчитать гистограммы оценок одним группирующим запросом.
+
+    Возвращает количество записанных строк гистограмм.
+    """
+    TitleScoreCount.objects.all().delete()
+    totals = (
+        Review.objects.order_by()
+        .values('title_id', 'score')
+        .annotate(score_count=Count('id'))
+    )
+    batch = []
+    created = 0
+    for row in totals.iterator():
+        batch.append(TitleScoreCount(
+            title_id=row['title_id'],
+            score=row['score'],
+            count=row['score_count'],
+        ))
+        if len(batch) >= batch_size:
+            TitleScoreCount.objects.bulk_create(batch)
+            created += batch_size
+            batch = []
+    TitleScoreCount.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild_comment_counts():
+    """Пересчитать количество комментариев всех отзывов одним UPDATE.
+
+    Возвращает количество обновлённых отзывов.
+    """
+    counts = (
+        Comment.objects.order_by()
+        .filter(review=OuterRef('pk'))
+        .values('review')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Review.objects.update(
+        comments_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+def trending_window_start():
+    """Начало скользящего окна популярных произведений."""
+    return review_hour(
+        timezone.now() - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    )
+
+
+def prune_review_buckets():
+    """Удалить почасовые счётчики, вышедшие за скользящее окно.
+
+    Возвращает количество удалённых строк.
+    """
+    deleted, _ = TitleReviewBucket.objects.filter(
+        hour__lt=trending_window_start()
+    ).delete()
+    return deleted
+
+
+def rebuild_review_buckets(batch_size=REBUILD_BATCH_SIZE):
+    """Пересчитать почасовые счётчики отзывов за скользящее окно.
+
+    Более старые счётчики удаляются. Возвращает количество строк.
+    """
+    TitleReviewBucket.objects.all().delete()
+    totals = (
+        Review.objects.order_by()
+        .filter(pub_date__gte=trending_window_start())
+        .annotate(hour=TruncHour('pub_date', tzinfo=timezone.utc))
+        .values('title_id', 'hour')
+        .annotate(review_count=Count('id'))
+    )
+    batch = []
+    created = 0
+    for row in totals.iterator():
+        batch.append(TitleReviewBucket(
+            title_id=row['title_id'],
+            hour=row['hour'],
+            count=row['review_count'],
+        ))
+        if len(batch) >= batch_size:
+            TitleReviewBucket.objects.bulk_create(batch)
+            created += batch_size
+            batch = []
+    TitleReviewBucket.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def _flush(batch):
+    """Записать накопленную пачку рейтингов."""
+    Title.objects.bulk_update(
+        batch, ('rating_sum', 'rating_count', 'rating'),
+    )
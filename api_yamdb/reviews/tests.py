@@ -0,0 +1,70 @@
+"""
+Тесты команд загрузки и генерации данных и массовой вставки строк.
+"""
+
+import io
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+
+from .bulk import insert_rows
+from .management.commands.generate_data import Command as GenerateData
+from .models import Category, Review
+
+
+class CsvToDbTest(TestCase):
+    """Даты из csv сохраняются, повторная загрузка ничего не вставляет."""
+
+    def load(self):
+        stdout = io.StringIO()
+        call_command('csv_to_db', stdout=stdout)
+        return stdout.getvalue()
+
+    def test_load(self):
+        output = self.load()
+        self.assertIn('Из файла review.csv загружено строк: 72, '
+                      'пропущено: 0, уже в БД: 0', output)
+        self.assertEqual(Review.objects.get(pk=1).pub_date,
+                         parse_datetime('2019-09-24T21:08:21.567Z'))
+        output = self.load()
+        self.assertIn('Из файла review.csv загружено строк: 0, '
+                      'пропущено: 0, уже в БД: 72', output)
+        self.assertEqual(Review.objects.count(), 72)
+
+
+class InsertRowsTest(TestCase):
+    """Пачка строк вставляется одним многострочным INSERT."""
+
+    def test_multi_row_insert(self):
+        Category.objects.create(name='Фильм', slug='movie')
+        rows = [('Книга', 'book'), ('Фильм', 'movie'), ('Музыка', 'music')]
+        # Путь PostgreSQL: многострочный VALUES поддерживает и SQLite.
+        with patch.object(connection, 'vendor', 'postgresql'):
+            with CaptureQueriesContext(connection) as context:
+                inserted = insert_rows(Category, ('name', 'slug'), rows,
+                                       ignore_conflicts=True)
+        self.assertEqual(inserted, 2)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(
+            sorted(Category.objects.values_list('slug', flat=True)),
+            ['book', 'movie', 'music'],
+        )
+
+
+class GenerateDataTest(SimpleTestCase):
+    """Отзывы распределяются полностью, не больше одного на автора."""
+
+    def test_review_counts(self):
+        counts = GenerateData().review_counts(
+            {'seed': 42, 'zipf': 1.1, 'reviews': 9_000}, range(1000), 10,
+        )
+        self.assertEqual(sum(counts.values()), 9_000)
+        self.assertEqual(max(counts.values()), 10)
+
+    def test_too_many_reviews(self):
+        with self.assertRaisesMessage(CommandError, 'Не больше 30 отзывов'):
+            call_command('generate_data', users=10, titles=3, reviews=31)
@@ -0,0 +1,209 @@
+"""
+Фоновая отправка писем.
+
+Письмо сохраняется в таблицу EmailJob (это гарантирует доставку после
+перезапуска процесса), а его id после фиксации транзакции передаётся
+пулу потоков текущего процесса. Потоки отправляют письма пачками через
+одно SMTP-соединение. Неудачные попытки повторяются с экспоненциальной
+задержкой: по таймеру письмо снова попадает в очередь процесса. Письма,
+оставшиеся в таблице после перезапуска процесса, отправляет команда
+drain_email_queue, которую нужно запускать по расписанию.
+"""
+
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import EmailJob
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'sent': 0, 'failed': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+
+
+def enqueue_mail(subject, message, from_email, recipient_list):
+    """Поставить письмо в очередь и сразу вернуть управление."""
+    job = EmailJob.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipients=','.join(recipient_list),
+    )
+    if settings.EMAIL_QUEUE_ASYNC:
+        transaction.on_commit(lambda: _submit(job.id))
+    return job
+
+
+def _submit(job_id):
+    _ensure_workers()
+    _queue.put(job_id)
+
+
+def _ensure_workers():
+    """Лениво запустить пул потоков (после fork воркера gunicorn)."""
+    with _workers_lock:
+        alive = [worker for worker in _workers if worker.is_alive()]
+        _workers[:] = alive
+        for number in range(settings.EMAIL_QUEUE_WORKERS - len(alive)):
+            worker = threading.Thread(
+                target=_worker_loop,
+                name=f'email-queue-{len(_workers) + number}',
+                daemon=True,
+            )
+            worker.start()
+            _workers.append(worker)
+
+
+def _worker_loop():
+    while True:
+        ids = [_queue.get()]
+        while len(ids) < settings.EMAIL_QUEUE_BATCH_SIZE:
+            try:
+                ids.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            close_old_connections()
+            deliver_batch(ids)
+        except Exception:
+            logger.exception('Ошибка фоновой отправки писем')
+        finally:
+            connection.close()
+            for _ in ids:
+                _queue.task_done()
+
+
+def claim_batch(limit, ids=None):
+    """Забрать до limit готовых к отправке писем, пометив их SENDING.
+
+    Письмо в статусе SENDING арендовано до next_attempt_at: если процесс
+    упал во время отправки, после истечения аренды письмо заберут снова.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = EmailJob.objects.select_for_update(skip_locked=True).filter(
+            status__in=(EmailJob.PENDING, EmailJob.SENDING),
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at')
+        if ids is not None:
+            jobs = jobs.filter(id__in=ids)
+        jobs = list(jobs[:limit])
+        EmailJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=EmailJob.SENDING,
+            next_attempt_at=now + timedelta(
+                seconds=settings.EMAIL_QUEUE_LEASE
+            ),
+        )
+    return jobs
+
+
+def deliver_batch(ids=None, limit=None):
+    """Отправить пачку писем через одно соединение.
+
+    Возвращает пару (отправлено, неудачно).
+    """
+    jobs = claim_batch(limit or settings.EMAIL_QUEUE_BATCH_SIZE, ids)
+    if not jobs:
+        return 0, 0
+    sent = failed = 0
+    try:
+        mail_connection = get_connection()
+        mail_connection.open()
+    except Exception as error:
+        # Соединение не открылось: попытка засчитывается всем письмам
+        # пачки, иначе они ждали бы истечения аренды без задержки.
+        for job in jobs:
+            _schedule_retry(job, error)
+        failed = len(jobs)
+    else:
+        with mail_connection:
+            for job in jobs:
+                try:
+                    EmailMessage(
+                        subject=job.subject,
+                        body=job.message,
+                        from_email=job.from_email,
+                        to=job.recipients.split(','),
+                        connection=mail_connection,
+                    ).send()
+                except Exception as error:
+                    _schedule_retry(job, error)
+                    failed += 1
+                else:
+                    _mark_sent(job)
+                    sent += 1
+    logger.info('Отправлено писем: %s, неудачно: %s, в очереди: %s',
+                sent, failed, _queue.qsize())
+    return sent, failed
+
+
+def _mark_sent(job):
+    now = timezone.now()
+    EmailJob.objects.filter(id=job.id).update(
+        status=EmailJob.SENT,
+        sent_at=now,
+        attempts=job.attempts + 1,
+    )
+    latency = (now - job.created_at).total_seconds()
+    with _stats_lock:
+        _stats['sent'] += 1
+        _stats['latency_total'] += latency
+        _stats['latency_max'] = max(_stats['latency_max'], latency)
+
+
+def _schedule_retry(job, error):
+    attempts = job.attempts + 1
+    if attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        status = EmailJob.FAILED
+        logger.error('Письмо %s не отправлено после %s попыток: %s',
+                     job.id, attempts, error)
+    else:
+        status = EmailJob.PENDING
+    delay = settings.EMAIL_QUEUE_BACKOFF * 2 ** (attempts - 1)
+    EmailJob.objects.filter(id=job.id).update(
+        status=status,
+        attempts=attempts,
+        last_error=str(error),
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if status == EmailJob.PENDING and settings.EMAIL_QUEUE_ASYNC:
+        _retry_later(job.id, delay)
+    with _stats_lock:
+        _stats['failed'] += 1
+
+
+def _retry_later(job_id, delay):
+    """Вернуть письмо в очередь процесса, когда подойдёт время повтора."""
+    timer = threading.Timer(delay, _submit, args=(job_id,))
+    timer.daemon = True
+    timer.start()
+
+
+def queue_stats():
+    """Глубина очереди и задержка доставки для текущего процесса и БД."""
+    with _stats_lock:
+        stats = dict(_stats)
+    latency_total = stats.pop('latency_total')
+    return {
+        'in_memory_depth': _queue.qsize(),
+        'pending': EmailJob.objects.filter(status=EmailJob.PENDING).count(),
+        'failed_total': EmailJob.objects.filter(
+            status=EmailJob.FAILED
+        ).count(),
+        'sent': stats['sent'],
+        'failed_attempts': stats['failed'],
+        'latency_avg': (
+            latency_total / stats['sent'] if stats['sent'] else 0.0
+        ),
+        'latency_max': stats['latency_max'],
+    }
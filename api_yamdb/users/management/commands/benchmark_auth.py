@@ -0,0 +1,63 @@
+import statistics
+import time
+
+from api.authentication import CachedJWTAuthentication, local_user_cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import User
+
+BENCHMARK_USERNAME = 'benchmark_auth'
+
+
+class Command(BaseCommand):
+    """Сравнивает JWTAuthentication и CachedJWTAuthentication."""
+
+    help = ('Замеряет время и число SQL-запросов на аутентификацию '
+            'одного запроса с JWT.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def measure(self, authentication, request, count):
+        """Возвращает (медиана в мкс, p99 в мкс, запросов на вызов)."""
+        timings = []
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(count):
+                started = time.perf_counter()
+                authentication.authenticate(request)
+                timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        return (
+            statistics.median(timings),
+            timings[int(len(timings) * 0.99) - 1],
+            len(context.captured_queries) / count,
+        )
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            email=f'{BENCHMARK_USERNAME}@yamdb.fake',
+        )
+        token = AccessToken.for_user(user)
+        request = APIRequestFactory().get(
+            '/api/v1/users/me/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        local_user_cache.clear()
+        try:
+            for name, authentication in (
+                ('JWTAuthentication', JWTAuthentication()),
+                ('CachedJWTAuthentication', CachedJWTAuthentication()),
+            ):
+                median, p99, queries = self.measure(
+                    authentication, request, options['requests']
+                )
+                self.stdout.write(
+                    f'{name}: медиана {median:.1f} мкс, p99 {p99:.1f} мкс, '
+                    f'SQL-запросов на запрос {queries:.3f}'
+                )
+        finally:
+            user.delete()
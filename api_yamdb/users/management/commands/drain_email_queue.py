@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users.mail_queue import deliver_batch, queue_stats
+
+
+class Command(BaseCommand):
+    """Отправляет все письма, ожидающие в таблице очереди."""
+
+    help = 'Отправляет накопившиеся письма из EmailJob пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_QUEUE_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_batch(limit=options['batch_size'])
+            if not sent and not failed:
+                break
+            total_sent += sent
+            total_failed += failed
+        stats = queue_stats()
+        self.stdout.write(
+            f'Отправлено: {total_sent}, неудачных попыток: {total_failed}. '
+            f'Ожидают повтора: {stats["pending"]}, '
+            f'не доставлено: {stats["failed_total"]}. '
+            f'Задержка доставки: средняя {stats["latency_avg"]:.1f} с, '
+            f'максимальная {stats["latency_max"]:.1f} с.'
+        )
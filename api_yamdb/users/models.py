@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from .validators import validate_username
 
@@ -60,3 +61,46 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class EmailJob(models.Model):
+    """Письмо в очереди фоновой отправки."""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=settings.MAX_EMAIL_LENGTH)
+    recipients = models.TextField(
+        help_text='Адреса получателей через запятую.',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='emailjob_status_next_idx'),
+        ]
+        verbose_name = 'письмо'
+        verbose_name_plural = 'письма'
+
+    def __str__(self):
+        return f'{self.subject} -> {self.recipients}'
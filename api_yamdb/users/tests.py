@@ -0,0 +1,83 @@
+"""
+Тесты фоновой отправки писем (users.mail_queue).
+"""
+
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail_queue import deliver_batch, enqueue_mail
+from .models import EmailJob
+
+
+@override_settings(EMAIL_QUEUE_ASYNC=True, EMAIL_QUEUE_BACKOFF=30,
+                   EMAIL_QUEUE_MAX_ATTEMPTS=3)
+@patch('users.mail_queue.threading.Timer')
+class MailQueueTest(TestCase):
+    """Отправка, повтор с задержкой и исчерпание попыток."""
+
+    def setUp(self):
+        self.job = enqueue_mail(
+            subject='Signup confirmation',
+            message='Код',
+            from_email='admin@yamdb.ru',
+            recipient_list=('user@yamdb.ru',),
+        )
+
+    def test_sent(self, timer):
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts),
+                         (EmailJob.SENT, 1))
+        self.assertEqual(mail.outbox[0].to, ['user@yamdb.ru'])
+        timer.assert_not_called()
+
+    @patch('users.mail_queue.EmailMessage.send',
+           side_effect=SMTPException('timeout'))
+    def test_retry_with_backoff(self, send, timer):
+        self.assertEqual(deliver_batch(), (0, 1))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts),
+                         (EmailJob.PENDING, 1))
+        self.assertEqual(self.job.last_error, 'timeout')
+        # Письмо возвращается в очередь процесса по таймеру.
+        timer.assert_called_once()
+        self.assertEqual(timer.call_args[0][0], 30)
+        # До истечения задержки письмо не забирается повторно.
+        self.assertEqual(deliver_batch(), (0, 0))
+        EmailJob.objects.filter(id=self.job.id).update(
+            next_attempt_at=timezone.now()
+        )
+        self.assertEqual(deliver_batch(), (0, 1))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.attempts, 2)
+        self.assertEqual(timer.call_args[0][0], 60)
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.open',
+           side_effect=SMTPException('connection refused'))
+    def test_connection_error(self, open_connection, timer):
+        self.assertEqual(deliver_batch(), (0, 1))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts),
+                         (EmailJob.PENDING, 1))
+        self.assertEqual(self.job.last_error, 'connection refused')
+        timer.assert_called_once()
+        self.assertEqual(mail.outbox, [])
+
+    @patch('users.mail_queue.EmailMessage.send',
+           side_effect=SMTPException('timeout'))
+    def test_max_attempts(self, send, timer):
+        EmailJob.objects.filter(id=self.job.id).update(
+            attempts=2, next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+        with self.assertLogs('users.mail_queue', 'ERROR'):
+            self.assertEqual(deliver_batch(), (0, 1))
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts),
+                         (EmailJob.FAILED, 3))
+        timer.assert_not_called()
+        self.assertEqual(deliver_batch(), (0, 0))